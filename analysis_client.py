@@ -0,0 +1,123 @@
+import json
+import time
+import argparse
+import http.client
+from urllib.parse import urlsplit
+
+
+class ServerBusy(Exception):
+    pass
+
+
+class AnalysisClient:
+    # One participant stream on an analysis_server.py instance. Keeps one
+    # connection open, so use one client per thread
+    def __init__(self, url='http://127.0.0.1:8765', timeout=30.0, jpeg_quality=90):
+        address = urlsplit(url)
+        self.connection = http.client.HTTPConnection(address.hostname, address.port or 80, timeout=timeout)
+        self.jpeg_quality = jpeg_quality
+        self.stream_id = None
+
+    def _request(self, method, path, body=None, headers=None):
+        self.connection.request(method, path, body=body, headers=headers or {})
+        response = self.connection.getresponse()
+        data = json.loads(response.read() or b'null')
+
+        if response.status == 503:
+            raise ServerBusy(data['error'])
+        if response.status >= 400:
+            raise RuntimeError(f"{method} {path} failed with {response.status}: {data['error']}")
+        return data
+
+    def _json_request(self, method, path, data):
+        return self._request(method, path, json.dumps(data).encode(), {'Content-Type': 'application/json'})
+
+    def open_stream(self, screen_width=1920, screen_height=1080, calibration_points=None, gaze_model='idw'):
+        options = {'screen_width': screen_width, 'screen_height': screen_height, 'gaze_model': gaze_model}
+        if calibration_points:
+            options['calibration_points'] = [list(point) for point in calibration_points]
+        self.stream_id = self._json_request('POST', '/streams', options)['stream_id']
+        return self.stream_id
+
+    def encode_frame(self, frame):
+        import cv2
+        ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if not ok:
+            raise ValueError("Could not encode the frame")
+        return encoded.tobytes()
+
+    def send_frame(self, frame, timestamp=None):
+        # frame is a BGR image, or bytes already encoded with encode_frame
+        encoded = frame if isinstance(frame, bytes) else self.encode_frame(frame)
+        headers = {'Content-Type': 'image/jpeg',
+                   'X-Timestamp': repr(time.time() if timestamp is None else timestamp)}
+        return self._request('POST', f'/streams/{self.stream_id}/frames', encoded, headers)
+
+    def send_features(self, rows):
+        # rows: dicts with timestamp, pupils_located, left_pupil, right_pupil,
+        # horizontal_ratio, vertical_ratio and is_blinking
+        return self._json_request('POST', f'/streams/{self.stream_id}/features', list(rows))
+
+    def get_analysis(self):
+        return self._request('GET', f'/streams/{self.stream_id}/analysis')
+
+    def get_stats(self):
+        return self._request('GET', '/stats')
+
+    def close_stream(self):
+        analysis = self._request('DELETE', f'/streams/{self.stream_id}')
+        self.stream_id = None
+        return analysis
+
+    def close(self):
+        self.connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream a recording to an analysis server, like one participant would")
+    parser.add_argument('--server', default='http://127.0.0.1:8765')
+    parser.add_argument('--video', default=None, help="Recorded video to stream")
+    parser.add_argument('--images', default=None, help="Directory of images to stream")
+    parser.add_argument('--realtime', action='store_true', help="Send frames at their original rate")
+    parser.add_argument('--max-frames', type=int, default=None)
+    parser.add_argument('--output', default=None, help="Write the final analysis to this JSON file")
+    args = parser.parse_args()
+
+    from frame_sources import VideoFileSource, ImageSequenceSource
+    if args.video:
+        source = VideoFileSource(args.video, realtime=args.realtime)
+    elif args.images:
+        source = ImageSequenceSource(args.images, realtime=args.realtime)
+    else:
+        parser.error("Give --video or --images")
+    if not source.open():
+        raise SystemExit("Could not open the recording")
+
+    client = AnalysisClient(args.server)
+    client.open_stream()
+    sent = refused = located = 0
+    try:
+        while args.max_frames is None or sent < args.max_frames:
+            captured = source.read()
+            if captured is None:
+                break
+            frame, timestamp = captured
+            try:
+                located += client.send_frame(frame, timestamp)['pupils_located']
+                sent += 1
+            except ServerBusy:
+                refused += 1
+        analysis = client.close_stream()
+    finally:
+        source.release()
+        client.close()
+
+    print(f"Sent {sent} frames ({refused} refused), pupils located in {located}")
+    print(f"Assessment: {analysis['assessment']}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(analysis, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
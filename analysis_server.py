@@ -0,0 +1,439 @@
+import os
+import json
+import time
+import uuid
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from calibration import CalibrationModule
+from data_processing import DataProcessing, analyze_frame
+from data_acquisition import frame_data_from_result
+
+
+class ServerBusy(Exception):
+    pass
+
+
+class StreamAnalysis:
+    # Tracker, screen calibration and analysis of one participant stream,
+    # living in the worker process the stream is assigned to
+    def __init__(self, screen_width=1920, screen_height=1080, calibration_points=None, gaze_model='idw'):
+        self.calibration = CalibrationModule(screen_width, screen_height, gaze_model)
+        if calibration_points:
+            self.calibration.set_calibration_points(calibration_points)
+        self.data_processing = DataProcessing(screen_width, screen_height)
+        self._gaze_tracker = None  # Feature streams never need one
+        self.frames = 0
+        self.last_timestamp = None
+
+    @property
+    def gaze_tracker(self):
+        if self._gaze_tracker is None:
+            from gaze_tracking import GazeTracking
+            self._gaze_tracker = GazeTracking(face_tracking=True)
+        return self._gaze_tracker
+
+    def process_frame(self, encoded, timestamp):
+        import cv2
+        import numpy as np
+        frame = cv2.imdecode(np.frombuffer(encoded, np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            raise ValueError("Could not decode the frame image")
+        return self._process_result(self.gaze_tracker.refresh(frame), timestamp)
+
+    def process_features(self, rows):
+        # Rows tracked by the client: GazeResult fields plus a timestamp. All
+        # rows are checked first, so a bad request leaves the stream untouched
+        if not isinstance(rows, list):
+            raise ValueError("Features must be a JSON list of rows")
+        parsed = [self._parse_row(row) for row in rows]
+        return [self._process_result(result, timestamp) for result, timestamp in parsed]
+
+    @staticmethod
+    def _parse_row(row):
+        from gaze_tracking.gaze_result import GazeResult
+
+        def point(name):
+            value = row.get(name)
+            if not isinstance(value, (list, tuple)) or len(value) != 2:
+                raise ValueError(f"Row with located pupils needs {name} as [x, y]")
+            return int(value[0]), int(value[1])
+
+        def number(name):
+            value = row.get(name)
+            return None if value is None else float(value)
+
+        if not isinstance(row, dict):
+            raise ValueError("Each feature row must be a JSON object")
+        if row.get('timestamp') is None:
+            raise ValueError("Feature row is missing its timestamp")
+        located = bool(row.get('pupils_located'))
+        result = GazeResult(
+            pupils_located=located,
+            left_pupil=point('left_pupil') if located else None,
+            right_pupil=point('right_pupil') if located else None,
+            horizontal_ratio=number('horizontal_ratio'),
+            vertical_ratio=number('vertical_ratio'),
+            is_blinking=bool(row.get('is_blinking')),
+        )
+        return result, float(row['timestamp'])
+
+    def _process_result(self, result, timestamp):
+        # Session time follows the stream's own timestamps
+        if self.frames == 0:
+            self.data_processing.reset_session(start_time=timestamp)
+
+        gaze_position = analyze_frame(self.calibration, self.data_processing,
+                                      frame_data_from_result(result, timestamp))
+        self.frames += 1
+        self.last_timestamp = timestamp
+
+        def point(value):
+            return [int(value[0]), int(value[1])] if value else None
+
+        def number(value):
+            return None if value is None else float(value)
+
+        return {
+            'timestamp': timestamp,
+            'pupils_located': bool(result.pupils_located),
+            'left_pupil': point(result.left_pupil),
+            'right_pupil': point(result.right_pupil),
+            'horizontal_ratio': number(result.horizontal_ratio),
+            'vertical_ratio': number(result.vertical_ratio),
+            'is_blinking': bool(result.is_blinking),
+            'gaze_position': point(gaze_position),
+        }
+
+    def analysis(self):
+        if self.last_timestamp is not None:
+            self.data_processing.end_session(self.last_timestamp)
+        analysis = self.data_processing.get_comprehensive_analysis()
+        analysis['frames'] = self.frames
+        return analysis
+
+
+# Streams owned by this worker process
+_streams = {}
+
+
+def _init_worker():
+    # Load the face models before the first stream arrives
+    try:
+        from gaze_tracking import models
+    except ImportError:
+        return  # No dlib: this server can only analyze feature streams
+    models.preload()
+
+
+def _ping():
+    return os.getpid()
+
+
+def _open_stream(stream_id, options):
+    _streams[stream_id] = StreamAnalysis(**options)
+
+
+def _process_frame(stream_id, encoded, timestamp):
+    return _streams[stream_id].process_frame(encoded, timestamp)
+
+
+def _process_features(stream_id, rows):
+    return _streams[stream_id].process_features(rows)
+
+
+def _stream_analysis(stream_id):
+    return _streams[stream_id].analysis()
+
+
+def _close_stream(stream_id):
+    return _streams.pop(stream_id).analysis()
+
+
+class StreamScheduler:
+    def __init__(self, workers=None, max_pending=8, idle_timeout=300.0):
+        # One single-process pool per worker, so a stream's state stays in
+        # the process it was assigned to and its frames run in order
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending  # Queued requests per worker before new ones are refused
+        self.idle_timeout = idle_timeout  # Seconds without requests before a stream is closed, None to keep
+        self.context = multiprocessing.get_context('spawn')
+        self.executors = [self._new_executor() for _ in range(self.workers)]
+
+        self.lock = threading.Lock()
+        self.pending = [0] * self.workers
+        self.stream_counts = [0] * self.workers
+        self.stream_workers = {}  # stream id -> worker index
+        self.last_used = {}  # stream id -> time.monotonic() of its last request
+        self.requests_done = 0
+        self.requests_refused = 0
+        self.streams_evicted = 0
+        self.streams_lost = 0
+        self.workers_restarted = 0
+        self.stopping = threading.Event()
+        self.eviction_thread = None
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(max_workers=1, mp_context=self.context, initializer=_init_worker)
+
+    def start(self):
+        # Starts every worker process and waits for the models to load
+        for executor in self.executors:
+            executor.submit(_ping).result()
+        if self.idle_timeout:
+            self.eviction_thread = threading.Thread(target=self._eviction_loop, daemon=True)
+            self.eviction_thread.start()
+
+    def _submit(self, worker, func, *args, force=False):
+        with self.lock:
+            if not force and self.pending[worker] >= self.max_pending:
+                self.requests_refused += 1
+                raise ServerBusy(f"Worker {worker} has {self.pending[worker]} requests queued")
+            self.pending[worker] += 1
+            executor = self.executors[worker]
+
+        try:
+            future = executor.submit(func, *args)
+        except BrokenProcessPool:
+            self._finished(worker, executor, None)
+            raise
+        future.add_done_callback(lambda done: self._finished(worker, executor, done))
+        return future
+
+    def _finished(self, worker, executor, future):
+        with self.lock:
+            self.pending[worker] -= 1
+            self.requests_done += 1
+        if future is None or (not future.cancelled() and isinstance(future.exception(), BrokenProcessPool)):
+            self._restart_worker(worker, executor)
+
+    def _restart_worker(self, worker, broken):
+        # The worker process died (crash, OOM kill), taking the state of its
+        # streams with it: they are dropped, so their clients get 404 and can
+        # open new ones, and a fresh process takes the worker's place
+        with self.lock:
+            if self.executors[worker] is not broken:
+                return  # Another request already restarted it
+            self.executors[worker] = self._new_executor()
+            lost = [stream_id for stream_id, owner in self.stream_workers.items() if owner == worker]
+            for stream_id in lost:
+                del self.stream_workers[stream_id]
+                self.last_used.pop(stream_id, None)
+            self.stream_counts[worker] = 0
+            self.streams_lost += len(lost)
+            self.workers_restarted += 1
+        broken.shutdown(wait=False)
+
+    def open_stream(self, **options):
+        stream_id = uuid.uuid4().hex[:12]
+        with self.lock:
+            worker = min(range(self.workers), key=self.stream_counts.__getitem__)
+            self.stream_counts[worker] += 1
+            self.stream_workers[stream_id] = worker
+            self.last_used[stream_id] = time.monotonic()
+
+        try:
+            self._submit(worker, _open_stream, stream_id, options, force=True).result()
+        except Exception:
+            self._forget_stream(stream_id)
+            raise
+        return stream_id
+
+    def _forget_stream(self, stream_id):
+        with self.lock:
+            worker = self.stream_workers.pop(stream_id)
+            self.last_used.pop(stream_id, None)
+            self.stream_counts[worker] -= 1
+        return worker
+
+    def _stream_worker(self, stream_id):
+        with self.lock:
+            worker = self.stream_workers[stream_id]
+            self.last_used[stream_id] = time.monotonic()
+        return worker
+
+    def submit_frame(self, stream_id, encoded, timestamp):
+        return self._submit(self._stream_worker(stream_id), _process_frame, stream_id, encoded, timestamp)
+
+    def submit_features(self, stream_id, rows):
+        return self._submit(self._stream_worker(stream_id), _process_features, stream_id, rows)
+
+    def get_analysis(self, stream_id):
+        return self._submit(self._stream_worker(stream_id), _stream_analysis, stream_id, force=True)
+
+    def close_stream(self, stream_id):
+        worker = self._forget_stream(stream_id)
+        return self._submit(worker, _close_stream, stream_id, force=True)
+
+    def evict_idle_streams(self, now=None):
+        # Closes streams whose client went away without a DELETE
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            idle = [stream_id for stream_id, used in self.last_used.items() if now - used >= self.idle_timeout]
+        evicted = []
+        for stream_id in idle:
+            try:
+                self.close_stream(stream_id)
+            except (KeyError, BrokenProcessPool):
+                continue  # Closed or lost in the meantime
+            evicted.append(stream_id)
+        with self.lock:
+            self.streams_evicted += len(evicted)
+        return evicted
+
+    def _eviction_loop(self):
+        while not self.stopping.wait(min(self.idle_timeout / 2, 30.0)):
+            self.evict_idle_streams()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'workers': self.workers,
+                'streams': len(self.stream_workers),
+                'streams_per_worker': list(self.stream_counts),
+                'pending_per_worker': list(self.pending),
+                'requests_done': self.requests_done,
+                'requests_refused': self.requests_refused,
+                'streams_evicted': self.streams_evicted,
+                'streams_lost': self.streams_lost,
+                'workers_restarted': self.workers_restarted,
+            }
+
+    def shutdown(self):
+        self.stopping.set()
+        for executor in self.executors:
+            executor.shutdown(cancel_futures=True)
+
+
+class AnalysisRequestHandler(BaseHTTPRequestHandler):
+    # POST   /streams                  open a stream (JSON options), returns its id
+    # POST   /streams/<id>/frames      one encoded image (JPEG/PNG), X-Timestamp header
+    # POST   /streams/<id>/features    JSON list of already tracked rows
+    # GET    /streams/<id>/analysis    analysis so far
+    # DELETE /streams/<id>             final analysis, the stream is closed
+    # GET    /stats                    scheduler counters
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # Small responses on kept-alive connections otherwise wait ~40 ms
+    result_timeout = 30.0
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return self.rfile.read(length) if length else b''
+
+    def _send_json(self, status, data, headers=None):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, action):
+        try:
+            self._send_json(*action())
+        except ServerBusy as e:
+            self._send_json(503, {'error': str(e)}, {'Retry-After': '1'})
+        except KeyError:
+            self._send_json(404, {'error': f"Unknown stream or path {self.path}"})
+        except (ValueError, TypeError) as e:
+            self._send_json(400, {'error': str(e)})
+        except Exception as e:
+            self._send_json(500, {'error': str(e)})
+
+    def _path_parts(self):
+        return self.path.split('?')[0].strip('/').split('/')
+
+    def do_POST(self):
+        body = self._read_body()
+        parts = self._path_parts()
+        scheduler = self.server.scheduler
+
+        def action():
+            if parts == ['streams']:
+                options = json.loads(body) if body else {}
+                return 201, {'stream_id': scheduler.open_stream(**options)}
+            if len(parts) == 3 and parts[0] == 'streams' and parts[2] == 'frames':
+                timestamp = float(self.headers.get('X-Timestamp', time.time()))
+                future = scheduler.submit_frame(parts[1], body, timestamp)
+                return 200, future.result(self.result_timeout)
+            if len(parts) == 3 and parts[0] == 'streams' and parts[2] == 'features':
+                future = scheduler.submit_features(parts[1], json.loads(body))
+                return 200, future.result(self.result_timeout)
+            raise KeyError(self.path)
+
+        self._handle(action)
+
+    def do_GET(self):
+        parts = self._path_parts()
+        scheduler = self.server.scheduler
+
+        def action():
+            if parts == ['stats']:
+                return 200, scheduler.stats()
+            if len(parts) == 3 and parts[0] == 'streams' and parts[2] == 'analysis':
+                return 200, scheduler.get_analysis(parts[1]).result(self.result_timeout)
+            raise KeyError(self.path)
+
+        self._handle(action)
+
+    def do_DELETE(self):
+        parts = self._path_parts()
+        scheduler = self.server.scheduler
+
+        def action():
+            if len(parts) == 2 and parts[0] == 'streams':
+                return 200, scheduler.close_stream(parts[1]).result(self.result_timeout)
+            raise KeyError(self.path)
+
+        self._handle(action)
+
+    def log_message(self, format, *args):
+        # One line per frame would flood the console
+        pass
+
+
+class AnalysisHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # Many participants may connect at once
+
+    def __init__(self, address, scheduler):
+        super().__init__(address, AnalysisRequestHandler)
+        self.scheduler = scheduler
+
+
+def create_server(host='127.0.0.1', port=8765, workers=None, max_pending=8, idle_timeout=300.0):
+    scheduler = StreamScheduler(workers, max_pending, idle_timeout)
+    scheduler.start()
+    return AnalysisHTTPServer((host, port), scheduler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze many participant streams on one machine")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--max-pending', type=int, default=8,
+                        help="Requests queued per worker before new frames are refused with 503")
+    parser.add_argument('--idle-timeout', type=float, default=300.0,
+                        help="Close streams that sent nothing for this many seconds (0 keeps them)")
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port, args.workers, args.max_pending, args.idle_timeout or None)
+    print(f"Serving on http://{args.host}:{server.server_address[1]} "
+          f"with {server.scheduler.workers} workers, Ctrl+C to stop")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.scheduler.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Compares face detection latency and pupil precision at several detection scales.
+
+Every scale replays the same frames, so pupil deviation is measured against
+the full-resolution (1.0) run frame by frame.
+
+    python benchmarks/detection_scale.py --video session.mp4 --frames 300
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from gaze_tracking import GazeTracking
+
+
+def read_frames(source, max_frames):
+    capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        raise RuntimeError(f"Could not open video source {source!r}")
+
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = capture.read()
+        if not ret:
+            break
+        frames.append(frame)
+    capture.release()
+    return frames
+
+
+def run_scale(frames, scale):
+    tracker = GazeTracking(detection_scale=scale)
+    latencies = []
+    pupils = []
+
+    detect_face = tracker._detect_face
+
+    def timed_detect_face(frame):
+        start = time.perf_counter()
+        face = detect_face(frame)
+        latencies.append((time.perf_counter() - start) * 1000)
+        return face
+
+    tracker._detect_face = timed_detect_face
+
+    for frame in frames:
+        tracker.refresh(frame)
+        if tracker.pupils_located:
+            pupils.append(tracker.pupil_left_coords() + tracker.pupil_right_coords())
+        else:
+            pupils.append(None)
+
+    return latencies, pupils
+
+
+def pupil_deviation(reference, pupils):
+    deviations = []
+    for ref, cur in zip(reference, pupils):
+        if ref is None or cur is None:
+            continue
+        ref = np.array(ref, dtype=np.float64).reshape(2, 2)
+        cur = np.array(cur, dtype=np.float64).reshape(2, 2)
+        deviations.extend(np.linalg.norm(ref - cur, axis=1))
+    return deviations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--video', default=None, help="Video file to replay (default: webcam 0)")
+    parser.add_argument('--frames', type=int, default=300, help="Number of frames to use")
+    parser.add_argument('--scales', type=float, nargs='+', default=[1.0, 0.5, 0.25])
+    parser.add_argument('--json', dest='json_path', default=None, help="Also write results to this file")
+    args = parser.parse_args()
+
+    frames = read_frames(args.video if args.video else 0, args.frames)
+    if not frames:
+        raise SystemExit("No frames read")
+    height, width = frames[0].shape[:2]
+    print(f"{len(frames)} frames at {width}x{height}")
+
+    results = []
+    reference = None
+    for scale in args.scales:
+        latencies, pupils = run_scale(frames, scale)
+        if reference is None:
+            reference = pupils
+        deviations = pupil_deviation(reference, pupils)
+
+        result = {
+            'scale': scale,
+            'detect_ms_p50': float(np.percentile(latencies, 50)),
+            'detect_ms_p99': float(np.percentile(latencies, 99)),
+            'pupils_located': sum(p is not None for p in pupils),
+            'pupil_dev_px_mean': float(np.mean(deviations)) if deviations else None,
+            'pupil_dev_px_max': float(np.max(deviations)) if deviations else None,
+        }
+        results.append(result)
+
+        dev_mean = f"{result['pupil_dev_px_mean']:.2f}" if deviations else "n/a"
+        dev_max = f"{result['pupil_dev_px_max']:.2f}" if deviations else "n/a"
+        print(f"scale {scale:<5} detect p50 {result['detect_ms_p50']:7.2f} ms  "
+              f"p99 {result['detect_ms_p99']:7.2f} ms  "
+              f"located {result['pupils_located']}/{len(frames)}  "
+              f"pupil dev mean {dev_mean} px  max {dev_max} px")
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
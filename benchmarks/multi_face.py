@@ -0,0 +1,82 @@
+"""Measures how the per-frame cost of MultiFaceTracking grows with the number of faces.
+
+Frames are built by tiling synthetic faces side by side. Face detection is
+replaced by the known face boxes, so only the per-face landmark, eye and pupil
+work is timed, once on a single thread and once on the thread pool:
+
+    python benchmarks/multi_face.py --max-faces 4 --workers 4
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import dlib
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from gaze_tracking import MultiFaceTracking
+from synthetic import synthetic_frame
+
+
+def tiled_frames(faces, count, width, height, seed):
+    # Each frame holds `faces` synthetic faces next to each other, with their boxes
+    frames = []
+    for i in range(count):
+        tiles = []
+        boxes = []
+        for face in range(faces):
+            tile, _, box = synthetic_frame(i + face * 1000, width, height, seed)
+            tiles.append(tile)
+            boxes.append(dlib.rectangle(box[0] + face * width, box[1], box[2] + face * width, box[3]))
+        frames.append((np.hstack(tiles), boxes))
+    return frames
+
+
+def time_tracking(frames, workers, warmup=5):
+    tracker = MultiFaceTracking(max_workers=workers)
+    boxes = frames[0][1]
+    tracker._detector.face_detector = lambda image, *args: boxes
+
+    for frame, _ in frames[:warmup]:
+        tracker.refresh(frame)
+
+    durations = []
+    for frame, _ in frames:
+        start = time.perf_counter_ns()
+        tracker.refresh(frame)
+        durations.append(time.perf_counter_ns() - start)
+    tracker.close()
+
+    return float(np.percentile(np.array(durations) / 1e6, 50))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--max-faces', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=4, help="Thread pool size for the parallel runs")
+    parser.add_argument('--frames', type=int, default=100)
+    parser.add_argument('--width', type=int, default=640, help="Width of each face tile")
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    rows = []
+    for faces in range(1, args.max_faces + 1):
+        frames = tiled_frames(faces, args.frames, args.width, args.height, args.seed)
+        sequential = time_tracking(frames, workers=1)
+        parallel = time_tracking(frames, workers=args.workers)
+        rows.append({'faces': faces, 'sequential_p50_ms': sequential, 'parallel_p50_ms': parallel})
+        print(f"{faces} faces: {sequential:.2f} ms sequential, {parallel:.2f} ms on {args.workers} threads "
+              f"({parallel / rows[0]['parallel_p50_ms']:.2f}x one face)")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'workers': args.workers, 'results': rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
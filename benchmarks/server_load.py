@@ -0,0 +1,189 @@
+"""Load-tests analysis_server.py and reports how many streams per core it sustains.
+
+Each simulated participant is a thread with its own AnalysisClient that sends
+frames at --fps, like a webcam would (late frames are skipped, never bunched
+up). The number of streams doubles until the streams no longer reach 95% of
+the target rate or too many frames are refused. By default the server runs
+in-process on a free port, where the HTTP threads share an interpreter with
+the clients; --url targets a server running on its own:
+
+    python benchmarks/server_load.py --fps 15 --workers 4
+    python benchmarks/server_load.py --mode features --fps 30 --max-streams 256
+"""
+import argparse
+import http.client
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from analysis_client import AnalysisClient, ServerBusy
+from synthetic import synthetic_frame
+
+
+def load_payloads(args):
+    # Encoded frames are prepared once, so clients spend no time encoding
+    if args.mode == 'features':
+        return [{'pupils_located': True, 'left_pupil': [300 + i % 7, 220], 'right_pupil': [400 + i % 7, 221],
+                 'horizontal_ratio': 0.45 + i % 10 / 100, 'vertical_ratio': 0.5, 'is_blinking': i % 60 == 0}
+                for i in range(30)]
+
+    frames = []
+    if args.video:
+        capture = cv2.VideoCapture(args.video)
+        while len(frames) < 30:
+            ret, frame = capture.read()
+            if not ret:
+                break
+            frames.append(frame)
+        capture.release()
+    if not frames:
+        frames = [synthetic_frame(i, args.width, args.height)[0] for i in range(30)]
+    return [cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes() for frame in frames]
+
+
+def run_stream(url, mode, payloads, fps, seconds, stats):
+    latencies = []
+    refused = 0
+    interval = 1.0 / fps
+    start = time.perf_counter()
+    try:
+        client = AnalysisClient(url)
+        client.open_stream()
+    except (OSError, RuntimeError) as e:
+        # Counts as a stream that got nothing through
+        stats.append({'answered': 0, 'refused': 0, 'elapsed': seconds, 'latencies': [], 'error': str(e)})
+        return
+    next_send = start
+    sent = 0
+
+    while True:
+        now = time.perf_counter()
+        if now - start >= seconds:
+            break
+        if next_send > now:
+            time.sleep(next_send - now)
+        next_send = max(next_send + interval, time.perf_counter() - interval)
+
+        payload = payloads[sent % len(payloads)]
+        timestamp = start + sent * interval
+        request_start = time.perf_counter()
+        try:
+            if mode == 'features':
+                client.send_features([dict(payload, timestamp=timestamp)])
+            else:
+                client.send_frame(payload, timestamp)
+            latencies.append(time.perf_counter() - request_start)
+        except ServerBusy:
+            refused += 1
+        except (OSError, RuntimeError, http.client.HTTPException):
+            break
+        sent += 1
+
+    elapsed = max(time.perf_counter() - start, seconds)
+    try:
+        client.close_stream()
+    except (OSError, RuntimeError, http.client.HTTPException):
+        pass
+    client.close()
+    stats.append({'answered': len(latencies), 'refused': refused, 'elapsed': elapsed, 'latencies': latencies})
+
+
+def run_level(url, streams, args, payloads):
+    stats = []
+    threads = [threading.Thread(target=run_stream, args=(url, args.mode, payloads, args.fps, args.seconds, stats))
+               for _ in range(streams)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stream_fps = [entry['answered'] / entry['elapsed'] for entry in stats]
+    latencies = np.array([latency for entry in stats for latency in entry['latencies']]) * 1000
+    answered = sum(entry['answered'] for entry in stats)
+    refused = sum(entry['refused'] for entry in stats)
+    return {
+        'streams': streams,
+        'min_stream_fps': float(min(stream_fps)),
+        'mean_stream_fps': float(np.mean(stream_fps)),
+        'total_fps': float(sum(stream_fps)),
+        'refused_ratio': refused / max(1, answered + refused),
+        'latency_p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else None,
+        'latency_p99_ms': float(np.percentile(latencies, 99)) if len(latencies) else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default=None, help="Server to test instead of starting one in-process")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes of the in-process server")
+    parser.add_argument('--max-pending', type=int, default=8)
+    parser.add_argument('--mode', choices=['frames', 'features'], default='frames')
+    parser.add_argument('--video', default=None, help="Clip to take the frames from instead of synthetic ones")
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--fps', type=float, default=15.0, help="Target frames per second per stream")
+    parser.add_argument('--seconds', type=float, default=10.0, help="Duration of each load level")
+    parser.add_argument('--max-streams', type=int, default=64)
+    parser.add_argument('--max-refused', type=float, default=0.01, help="Refused frame ratio still counted as sustained")
+    parser.add_argument('--output', default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        from analysis_server import create_server
+        server = create_server(port=0, workers=args.workers, max_pending=args.max_pending)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    client = AnalysisClient(url)
+    cores = client.get_stats()['workers']  # One worker process per core
+    client.close()
+    payloads = load_payloads(args)
+
+    levels = []
+    sustained = 0
+    streams = 1
+    try:
+        while streams <= args.max_streams:
+            level = run_level(url, streams, args, payloads)
+            level['sustained'] = (level['min_stream_fps'] >= 0.95 * args.fps and
+                                  level['refused_ratio'] <= args.max_refused)
+            levels.append(level)
+            print(f"{streams:4d} streams: {level['min_stream_fps']:.1f} fps slowest stream, "
+                  f"p99 {level['latency_p99_ms'] or 0:.1f} ms, {level['refused_ratio']:.1%} refused"
+                  f"{'' if level['sustained'] else '  <- below target'}")
+            if not level['sustained']:
+                break
+            sustained = streams
+            streams *= 2
+    finally:
+        if server:
+            server.shutdown()
+            server.server_close()
+            server.scheduler.shutdown()
+
+    report = {
+        'mode': args.mode,
+        'target_fps': args.fps,
+        'cores': cores,
+        'max_sustained_streams': sustained,
+        'streams_per_core': sustained / cores,
+        'levels': levels,
+    }
+    print(f"Sustained {sustained} streams at {args.fps:g} fps on {cores} cores: "
+          f"{report['streams_per_core']:.2f} streams per core")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""Times each stage of the tracking pipeline separately and reports JSON.
+
+Stages run on deterministic synthetic frames by default, or on the frames of
+a recorded clip with --video (synthetic eyes are used for the eye stages when
+no face is found in the clip). Output is machine readable so results from
+different commits can be compared:
+
+    python benchmarks/stage_benchmark.py --output before.json
+    python benchmarks/stage_benchmark.py --video session.mp4 --iterations 500
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import dlib
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from gaze_tracking import GazeTracking, GazeResult
+from gaze_tracking.eye import Eye
+from gaze_tracking.pupil import Pupil
+from gaze_tracking.calibration import Calibration
+from calibration import CalibrationModule
+from data_processing import DataProcessing
+from synthetic import synthetic_frame
+
+
+def time_stage(func, inputs, iterations, warmup=5):
+    for args in inputs[:warmup]:
+        func(*args)
+
+    durations = []
+    for i in range(iterations):
+        args = inputs[i % len(inputs)]
+        start = time.perf_counter_ns()
+        func(*args)
+        durations.append(time.perf_counter_ns() - start)
+
+    durations_ms = np.array(durations) / 1e6
+    p50 = float(np.percentile(durations_ms, 50))
+    return {
+        'iterations': iterations,
+        'p50_ms': p50,
+        'p99_ms': float(np.percentile(durations_ms, 99)),
+        'mean_ms': float(durations_ms.mean()),
+        'fps': 1000.0 / p50 if p50 > 0 else None,
+    }
+
+
+def load_frames(args):
+    if not args.video:
+        return [synthetic_frame(i, args.width, args.height, args.seed) for i in range(args.frames)]
+
+    capture = cv2.VideoCapture(args.video)
+    frames = []
+    while len(frames) < args.frames:
+        ret, frame = capture.read()
+        if not ret:
+            break
+        frames.append((frame, None, None))
+    capture.release()
+    if not frames:
+        raise SystemExit(f"No frames read from {args.video}")
+    return frames
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=Path(__file__).resolve().parent,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def isolate_eye(gray, landmarks):
+    eye = Eye.__new__(Eye)
+    eye._isolate(gray, landmarks, Eye.LEFT_EYE_POINTS)
+    return eye
+
+
+def build_session(frames_count, seed):
+    rng = np.random.default_rng(seed)
+    processing = DataProcessing()
+    timestamp = processing.session_start
+    for _ in range(frames_count):
+        timestamp += 1 / 30
+        gaze_position = (int(rng.integers(0, 1920)), int(rng.integers(0, 1080)))
+        processing.process_frame({'timestamp': timestamp, 'is_blinking': rng.random() < 0.05}, gaze_position)
+    return processing
+
+
+def build_calibration(seed):
+    rng = np.random.default_rng(seed)
+    calibration = CalibrationModule()
+    calibration.set_calibration_points([
+        (300 + screen_x / 20 + rng.normal(), 200 + screen_y / 30 + rng.normal(),
+         screen_x, screen_y, 0.3 + screen_x / 5000, 0.3 + screen_y / 4000)
+        for screen_x, screen_y in calibration.get_calibration_points()
+    ])
+    return calibration
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--video', default=None, help="Recorded clip to use instead of synthetic frames")
+    parser.add_argument('--frames', type=int, default=60, help="Distinct frames to cycle through")
+    parser.add_argument('--iterations', type=int, default=200, help="Timed calls per stage")
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--session-frames', type=int, default=18000,
+                        help="Frames already processed when timing the session analysis")
+    parser.add_argument('--output', default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    frames = load_frames(args)
+    tracker = GazeTracking()
+    grays = [cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) for frame, _, _ in frames]
+
+    # Face boxes and landmarks: from dlib on recorded clips, known on synthetic frames
+    faces = []
+    eye_inputs = []
+    for gray, (_, landmarks, face_box) in zip(grays, frames):
+        if face_box is not None:
+            face = dlib.rectangle(*face_box)
+        else:
+            detections = tracker._detector.face_detector(gray)
+            if len(detections) == 0:
+                continue
+            face = detections[0]
+            landmarks = tracker._predictor(gray, face)
+        faces.append((gray, face))
+        eye_inputs.append((gray, landmarks))
+
+    if not eye_inputs:
+        # No face in the clip, fall back to synthetic eyes for the eye stages
+        for i in range(args.frames):
+            frame, landmarks, face_box = synthetic_frame(i, args.width, args.height, args.seed)
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            faces.append((gray, dlib.rectangle(*face_box)))
+            eye_inputs.append((gray, landmarks))
+
+    eye_frames = [isolate_eye(gray, landmarks).frame for gray, landmarks in eye_inputs]
+    thresholds = [Calibration.find_best_threshold(eye_frame) for eye_frame in eye_frames]
+    pupil_inputs = list(zip(eye_frames, thresholds))
+
+    calibration = build_calibration(args.seed)
+    gaze_inputs = [((300 + i, 220), (400 + i, 221), GazeResult(True, (300 + i, 220), (400 + i, 221),
+                                                                0.4 + i / 1000, 0.5, False, False, False, True))
+                   for i in range(len(frames))]
+    processing = build_session(args.session_frames, args.seed)
+
+    stages = {
+        'face_detection': time_stage(tracker._detector.face_detector, [(gray,) for gray in grays], args.iterations),
+        'landmark_prediction': time_stage(tracker._predictor, faces, args.iterations),
+        'eye_isolate': time_stage(isolate_eye, eye_inputs, args.iterations),
+        'pupil_image_processing': time_stage(Pupil.image_processing, pupil_inputs, args.iterations),
+        'pupil_detect_iris': time_stage(Pupil, pupil_inputs, args.iterations),
+        'find_best_threshold': time_stage(Calibration.find_best_threshold,
+                                          [(eye_frame,) for eye_frame in eye_frames], args.iterations),
+        'predict_gaze_position': time_stage(calibration.predict_gaze_position, gaze_inputs, args.iterations),
+        'comprehensive_analysis': time_stage(processing.get_comprehensive_analysis, [()], args.iterations),
+    }
+
+    height, width = grays[0].shape[:2]
+    report = {
+        'commit': current_commit(),
+        'python': platform.python_version(),
+        'source': args.video or 'synthetic',
+        'frame_size': [width, height],
+        'stages': stages,
+    }
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+
+
+if __name__ == "__main__":
+    main()
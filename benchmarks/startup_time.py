@@ -0,0 +1,120 @@
+"""Measures cold-start time of main.py up to the first dialog.
+
+Each run starts a fresh interpreter that imports main, builds the app and
+stops as soon as the calibration prompt would be shown (the Tk windows are
+replaced by stand-ins, so no display is needed). Reports milliseconds from
+process launch and which heavy modules were already loaded at that point.
+
+The face models are loaded on a background thread started at launch, so dlib
+shows up as loaded before the dialog even though the main thread never waited
+for it. That thread holds the GIL while dlib deserializes the landmark model,
+which can still stall the first dialog. To show that, the driver then ticks
+like an event loop for --watch seconds and reports the longest gap between
+ticks; compare with --no-preload:
+
+    python benchmarks/startup_time.py --runs 5
+    python benchmarks/startup_time.py --runs 5 --no-preload
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+DRIVER = r"""
+import time
+start = time.perf_counter()
+import json, os, sys
+sys.path.insert(0, {root!r})
+
+import main
+imported = time.perf_counter()
+
+
+class NoWindow:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+def first_dialog(self):
+    dialog = time.perf_counter()
+    heavy = ['cv2', 'dlib', 'matplotlib', 'matplotlib.pyplot', 'numpy']
+    loaded = [name for name in heavy if name in sys.modules]
+
+    # Stand-in for the Tk event loop: a tick every 5 ms, delayed while
+    # another thread holds the GIL
+    longest_gap = 0.0
+    last = dialog
+    while last - dialog < {watch}:
+        time.sleep(0.005)
+        now = time.perf_counter()
+        longest_gap = max(longest_gap, now - last)
+        last = now
+
+    print(json.dumps({{
+        'import_ms': (imported - start) * 1000,
+        'dialog_ms': (dialog - start) * 1000,
+        'loaded': loaded,
+        'max_tick_gap_ms': longest_gap * 1000,
+    }}))
+    sys.stdout.flush()
+    os._exit(0)
+
+
+main.tk.Tk = NoWindow
+main.VisualizationUI.show_calibration_prompt = first_dialog
+main.SocialAnxietyTracker(log_dir=None, preload_models={preload}).run_complete_session()
+"""
+
+
+def run_once(preload=True, watch=1.0):
+    launched = time.perf_counter()
+    driver = DRIVER.format(root=str(ROOT), preload=preload, watch=watch)
+    output = subprocess.run([sys.executable, '-c', driver], capture_output=True, text=True, check=True).stdout
+    total_ms = (time.perf_counter() - launched) * 1000
+
+    report = json.loads(output.strip().splitlines()[-1])
+    report['launch_to_dialog_ms'] = total_ms - watch * 1000
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--no-preload', action='store_true', help="Don't load the face models at launch")
+    parser.add_argument('--watch', type=float, default=1.0,
+                        help="Seconds after the dialog during which stalls are measured")
+    parser.add_argument('--json', dest='json_path', default=None, help="Also write results to this file")
+    args = parser.parse_args()
+
+    runs = [run_once(not args.no_preload, args.watch) for _ in range(args.runs)]
+    summary = {
+        'runs': args.runs,
+        'preload': not args.no_preload,
+        'launch_to_dialog_ms_median': statistics.median(r['launch_to_dialog_ms'] for r in runs),
+        'in_process_dialog_ms_median': statistics.median(r['dialog_ms'] for r in runs),
+        'import_main_ms_median': statistics.median(r['import_ms'] for r in runs),
+        'loaded_before_dialog': runs[-1]['loaded'],
+        'max_tick_gap_ms_median': statistics.median(r['max_tick_gap_ms'] for r in runs),
+    }
+
+    print(f"Launch to first dialog: {summary['launch_to_dialog_ms_median']:.0f} ms (median of {args.runs})")
+    print(f"  import main:          {summary['import_main_ms_median']:.0f} ms")
+    print(f"  in-process to dialog: {summary['in_process_dialog_ms_median']:.0f} ms")
+    print(f"  heavy modules loaded: {', '.join(summary['loaded_before_dialog']) or 'none'}")
+    print(f"  longest stall after:  {summary['max_tick_gap_ms_median']:.0f} ms (5 ms ticks for {args.watch:g} s)")
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump({'summary': summary, 'runs': runs}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Deterministic synthetic face/eye frames for benchmarking without a camera.
+
+Frames contain two drawn eyes (white sclera, dark iris, some noise) at known
+positions, together with landmark objects laid out like the 68-point dlib
+model around each eye, so the Eye and Pupil stages can run on them.
+"""
+import cv2
+import numpy as np
+
+
+class SyntheticPoint:
+    def __init__(self, x, y):
+        self.x = int(x)
+        self.y = int(y)
+
+
+class SyntheticLandmarks:
+    """Stand-in for dlib.full_object_detection with only the eye points set"""
+
+    def __init__(self, points):
+        self.points = points
+
+    def part(self, index):
+        return self.points.get(index, SyntheticPoint(0, 0))
+
+
+def _eye_points(first_index, center_x, center_y, half_width, half_height):
+    # Corner, two top points, corner, two bottom points (dlib ordering)
+    return {
+        first_index: SyntheticPoint(center_x - half_width, center_y),
+        first_index + 1: SyntheticPoint(center_x - half_width // 3, center_y - half_height),
+        first_index + 2: SyntheticPoint(center_x + half_width // 3, center_y - half_height),
+        first_index + 3: SyntheticPoint(center_x + half_width, center_y),
+        first_index + 4: SyntheticPoint(center_x + half_width // 3, center_y + half_height),
+        first_index + 5: SyntheticPoint(center_x - half_width // 3, center_y + half_height),
+    }
+
+
+def synthetic_frame(index, width=1280, height=720, seed=0):
+    """Returns (bgr_frame, landmarks, face_box) for frame number index.
+
+    The iris moves along a fixed path so consecutive frames differ, and the
+    same (index, seed) always produces the same frame.
+    """
+    rng = np.random.default_rng(seed * 1000003 + index)
+    frame = np.full((height, width, 3), 170, np.uint8)
+    frame += rng.integers(0, 12, frame.shape, dtype=np.uint8)
+
+    face_w = width // 4
+    face_x = width // 2
+    face_y = height // 2
+    eye_y = face_y - face_w // 6
+    half_width = max(12, face_w // 12)
+    half_height = max(5, half_width // 2)
+    iris_radius = max(4, half_height)
+    gaze_offset = int(half_width * 0.4 * np.sin(index / 7.0))
+
+    cv2.ellipse(frame, (face_x, face_y), (face_w // 2, int(face_w * 0.65)), 0, 0, 360, (150, 160, 190), -1)
+
+    points = {}
+    for first_index, eye_x in ((36, face_x - face_w // 5), (42, face_x + face_w // 5)):
+        cv2.ellipse(frame, (eye_x, eye_y), (half_width, half_height), 0, 0, 360, (235, 235, 235), -1)
+        cv2.circle(frame, (eye_x + gaze_offset, eye_y), iris_radius, (25, 20, 20), -1)
+        points.update(_eye_points(first_index, eye_x, eye_y, half_width, half_height))
+
+    face_box = (face_x - face_w // 2, face_y - int(face_w * 0.65),
+                face_x + face_w // 2, face_y + int(face_w * 0.65))
+    return frame, SyntheticLandmarks(points), face_box
@@ -1,19 +1,31 @@
 import time
 import json
+import threading
 import numpy as np
 from pathlib import Path
 
 
 class CalibrationModule:
-    def __init__(self, screen_width=1920, screen_height=1080):
+    def __init__(self, screen_width=1920, screen_height=1080, gaze_model='idw'):
         self.screen_width = screen_width
         self.screen_height = screen_height
         self.calibration_data = []  # [(pupil_x, pupil_y, screen_x, screen_y, h_ratio, v_ratio), ...]
         self.is_calibrated = False
         
-        # Calibration parameters
-        self.min_samples_per_point = 10
-        self.calibration_duration_per_point = 3.0  # seconds
+        # 'idw' weights the nearest calibration points, 'regression' uses a
+        # least-squares polynomial fitted on (pupil_x, pupil_y, h_ratio, v_ratio)
+        self.gaze_model = gaze_model
+        self.regression_degree = 2  # Highest degree tried, chosen by leave-one-out error
+        self.regression_model = None
+        
+        # Calibration table as arrays, built on first use after every change
+        self._clear_calibration_arrays()
+        
+        # Interactive calibration: time to settle on the dot, then samples are
+        # streamed in until the window ends or enough were collected
+        self.settle_time_per_point = 1.0  # seconds
+        self.sampling_window_per_point = 1.5  # seconds
+        self.max_samples_per_point = 60
         self.outlier_threshold = 20  # pixels
         
     def get_calibration_points(self):
@@ -27,30 +39,22 @@ class CalibrationModule:
         ]
         return points
     
-    def collect_samples_for_point(self, data_acquisition, point_x, point_y):
-        samples = []
-        start_time = time.time()
+    def calibration_sample(self, frame_data):
+        # (avg_pupil_x, avg_pupil_y, h_ratio, v_ratio), or None if the frame is unusable
+        if not frame_data or not frame_data['pupils_located']:
+            return None
         
-        while (len(samples) < self.min_samples_per_point and 
-               (time.time() - start_time) < self.calibration_duration_per_point):
-            
-            frame_data = data_acquisition.get_frame_data()
-            if frame_data and frame_data['pupils_located']:
-                left_pupil = frame_data['left_pupil']
-                right_pupil = frame_data['right_pupil']
-                h_ratio = frame_data['horizontal_ratio']
-                v_ratio = frame_data['vertical_ratio']
-                
-                if left_pupil and right_pupil and h_ratio is not None and v_ratio is not None:
-                    # Calculate precise average pupil position
-                    avg_x = (left_pupil[0] + right_pupil[0]) / 2.0
-                    avg_y = (left_pupil[1] + right_pupil[1]) / 2.0
-                    
-                    samples.append((avg_x, avg_y, h_ratio, v_ratio))
-            
-            time.sleep(0.05)  # 20 FPS sampling
+        left_pupil = frame_data['left_pupil']
+        right_pupil = frame_data['right_pupil']
+        h_ratio = frame_data['horizontal_ratio']
+        v_ratio = frame_data['vertical_ratio']
         
-        return samples
+        if left_pupil and right_pupil and h_ratio is not None and v_ratio is not None:
+            # Calculate precise average pupil position
+            avg_x = (left_pupil[0] + right_pupil[0]) / 2.0
+            avg_y = (left_pupil[1] + right_pupil[1]) / 2.0
+            return (avg_x, avg_y, h_ratio, v_ratio)
+        return None
     
     def filter_outliers(self, samples):
         if len(samples) < 3:
@@ -87,6 +91,7 @@ class CalibrationModule:
             self.calibration_data.append((
                 avg_pupil_x, avg_pupil_y, screen_x, screen_y, avg_h_ratio, avg_v_ratio
             ))
+            self._clear_calibration_arrays()
             return True
         
         return False
@@ -94,13 +99,118 @@ class CalibrationModule:
     def complete_calibration(self, successful_points):
         if successful_points >= 4:  # Need at least 4 good points
             self.is_calibrated = True
+            self._prepare_calibration_arrays()
+            self.fit_regression_model()
             self.save_calibration()
             return True
         else:
             self.calibration_data = []
+            self._clear_calibration_arrays()
             return False
     
-    def predict_gaze_position(self, left_pupil, right_pupil, gaze_tracker):
+    def _clear_calibration_arrays(self):
+        self._cal_size = None
+        self._cal_pupils = None
+        self._cal_screen = None
+        self._cal_ratios = None
+    
+    def _prepare_calibration_arrays(self):
+        # Calibration table as arrays, rebuilt whenever calibration_data changes
+        table = np.asarray(self.calibration_data, dtype=np.float64).reshape(-1, 6)
+        self._cal_pupils = table[:, 0:2]
+        self._cal_screen = table[:, 2:4]
+        self._cal_ratios = table[:, 4:6]
+        self._cal_size = len(self.calibration_data)
+    
+    def _calibration_arrays(self):
+        if self._cal_size != len(self.calibration_data):
+            self._prepare_calibration_arrays()
+        return self._cal_pupils, self._cal_screen, self._cal_ratios
+    
+    @staticmethod
+    def _design_matrix(features, degree):
+        # Constant, linear and (for degree 2) all pairwise product terms
+        columns = [np.ones(len(features))]
+        columns += [features[:, i] for i in range(features.shape[1])]
+        if degree >= 2:
+            for i in range(features.shape[1]):
+                for j in range(i, features.shape[1]):
+                    columns.append(features[:, i] * features[:, j])
+        return np.column_stack(columns)
+    
+    def fit_regression_model(self):
+        if len(self.calibration_data) < 3:
+            self.regression_model = None
+            return None
+        
+        table = np.asarray(self.calibration_data, dtype=np.float64).reshape(-1, 6)
+        features = table[:, [0, 1, 4, 5]]
+        targets = table[:, 2:4]
+        
+        mean = features.mean(axis=0)
+        scale = features.std(axis=0)
+        scale[scale == 0] = 1.0
+        normalized = (features - mean) / scale
+        
+        # The degree with the smallest leave-one-out error wins. That error only
+        # means something with more points than the model has terms (5 affine,
+        # 15 quadratic); below that the affine model is used untested, e.g. with
+        # the 5 default points, where it passes through every point exactly
+        errors = {}
+        for degree in range(1, self.regression_degree + 1):
+            design = self._design_matrix(normalized, degree)
+            if len(table) > design.shape[1]:
+                errors[degree] = self._leave_one_out_error(design, targets)
+        degree = min(errors, key=errors.get) if errors else 1
+        
+        design = self._design_matrix(normalized, degree)
+        coefficients = np.linalg.lstsq(design, targets, rcond=None)[0]
+        
+        self.regression_model = {
+            'degree': degree,
+            'mean': mean.tolist(),
+            'scale': scale.tolist(),
+            'coefficients': coefficients.tolist(),
+            'loo_error': errors.get(degree)  # RMS pixels, None when untested
+        }
+        self._set_regression_arrays()
+        return self.regression_model
+    
+    @staticmethod
+    def _leave_one_out_error(design, targets):
+        # RMS screen distance between each point and its prediction by the
+        # model fitted on all the other points
+        errors = []
+        for i in range(len(design)):
+            others = np.arange(len(design)) != i
+            coefficients = np.linalg.lstsq(design[others], targets[others], rcond=None)[0]
+            errors.append(np.sum((design[i] @ coefficients - targets[i]) ** 2))
+        return float(np.sqrt(np.mean(errors)))
+    
+    def _set_regression_arrays(self):
+        model = self.regression_model
+        self._reg_degree = model['degree']
+        self._reg_mean = np.asarray(model['mean'], dtype=np.float64)
+        self._reg_scale = np.asarray(model['scale'], dtype=np.float64)
+        self._reg_coefficients = np.asarray(model['coefficients'], dtype=np.float64)
+    
+    def _predict_regression(self, features):
+        # features: (N, 4) rows of (pupil_x, pupil_y, h_ratio, v_ratio)
+        design = self._design_matrix((features - self._reg_mean) / self._reg_scale, self._reg_degree)
+        predictions = np.trunc(design @ self._reg_coefficients)
+        predictions[:, 0] = np.clip(predictions[:, 0], 0, self.screen_width)
+        predictions[:, 1] = np.clip(predictions[:, 1], 0, self.screen_height)
+        return predictions
+    
+    def _use_regression(self):
+        if self.gaze_model != 'regression':
+            return False
+        if self.regression_model is None:
+            self.fit_regression_model()
+        return self.regression_model is not None
+    
+    def predict_gaze_position(self, left_pupil, right_pupil, gaze):
+        # gaze is a GazeResult, or a GazeTracking whose latest result is used
         if not self.is_calibrated or not left_pupil or not right_pupil:
             return None
         
@@ -109,35 +219,35 @@ class CalibrationModule:
         pupil_y = (left_pupil[1] + right_pupil[1]) / 2.0
         
         # Get current gaze ratios
-        h_ratio = gaze_tracker.horizontal_ratio()
-        v_ratio = gaze_tracker.vertical_ratio()
+        result = getattr(gaze, 'result', gaze)
+        h_ratio = result.horizontal_ratio
+        v_ratio = result.vertical_ratio
         
         if h_ratio is None or v_ratio is None or len(self.calibration_data) < 3:
             return None
         
-        # Enhanced prediction using both pupil coordinates AND gaze ratios
-        distances = []
-        for cal_pupil_x, cal_pupil_y, cal_screen_x, cal_screen_y, cal_h_ratio, cal_v_ratio in self.calibration_data:
-            # Combined distance metric: spatial + ratio similarity
-            spatial_dist = np.sqrt((pupil_x - cal_pupil_x)**2 + (pupil_y - cal_pupil_y)**2)
-            ratio_dist = np.sqrt((h_ratio - cal_h_ratio)**2 + (v_ratio - cal_v_ratio)**2)
-            
-            # Weighted combination (spatial distance is more important)
-            combined_dist = spatial_dist + (ratio_dist * 100)  # Scale ratio distance
-            
-            distances.append((combined_dist, cal_screen_x, cal_screen_y))
+        if self._use_regression():
+            pred_x, pred_y = self._predict_regression(np.array([[pupil_x, pupil_y, h_ratio, v_ratio]]))[0]
+            return (int(pred_x), int(pred_y))
+        
+        cal_pupils, cal_screen, cal_ratios = self._calibration_arrays()
         
-        # Use weighted average of closest calibration points
-        distances.sort()
-        num_points = min(4, len(distances))  # Use up to 4 closest points
-        closest_points = distances[:num_points]
+        # Combined distance metric: spatial + ratio similarity
+        # (spatial distance is more important, ratio distance is scaled up)
+        spatial_dist = np.sqrt((pupil_x - cal_pupils[:, 0])**2 + (pupil_y - cal_pupils[:, 1])**2)
+        ratio_dist = np.sqrt((h_ratio - cal_ratios[:, 0])**2 + (v_ratio - cal_ratios[:, 1])**2)
+        combined_dist = spatial_dist + (ratio_dist * 100)
         
+        # Use weighted average of up to 4 closest calibration points
+        num_points = min(4, len(combined_dist))
+        closest = np.argpartition(combined_dist, num_points - 1)[:num_points]
+        closest = closest[np.lexsort((cal_screen[closest, 1], cal_screen[closest, 0], combined_dist[closest]))]
+        
+        weights = 1 / (combined_dist[closest] + 1)  # Inverse distance weighting
         total_weight = 0
         weighted_x = 0
         weighted_y = 0
-        
-        for dist, screen_x, screen_y in closest_points:
-            weight = 1 / (dist + 1)  # Inverse distance weighting
+        for weight, (screen_x, screen_y) in zip(weights, cal_screen[closest]):
             weighted_x += screen_x * weight
             weighted_y += screen_y * weight
             total_weight += weight
@@ -154,12 +264,50 @@ class CalibrationModule:
         
         return None
     
+    def predict_batch(self, pupils, ratios):
+        # pupils: (N, 2) averaged pupil positions, ratios: (N, 2) horizontal/vertical
+        # ratios. Returns (N, 2) screen positions, NaN where no prediction is possible
+        pupils = np.asarray(pupils, dtype=np.float64).reshape(-1, 2)
+        ratios = np.asarray(ratios, dtype=np.float64).reshape(-1, 2)
+        predictions = np.full((len(pupils), 2), np.nan)
+        
+        if not self.is_calibrated or len(self.calibration_data) < 3:
+            return predictions
+        
+        if self._use_regression():
+            valid = np.isfinite(pupils).all(axis=1) & np.isfinite(ratios).all(axis=1)
+            predictions[valid] = self._predict_regression(np.hstack([pupils[valid], ratios[valid]]))
+            return predictions
+        
+        cal_pupils, cal_screen, cal_ratios = self._calibration_arrays()
+        
+        spatial_dist = np.sqrt((pupils[:, None, 0] - cal_pupils[None, :, 0])**2 + 
+                               (pupils[:, None, 1] - cal_pupils[None, :, 1])**2)
+        ratio_dist = np.sqrt((ratios[:, None, 0] - cal_ratios[None, :, 0])**2 + 
+                             (ratios[:, None, 1] - cal_ratios[None, :, 1])**2)
+        combined_dist = spatial_dist + (ratio_dist * 100)
+        
+        num_points = min(4, combined_dist.shape[1])
+        closest = np.argpartition(combined_dist, num_points - 1, axis=1)[:, :num_points]
+        closest_dist = np.take_along_axis(combined_dist, closest, axis=1)
+        
+        weights = 1 / (closest_dist + 1)
+        total_weight = weights.sum(axis=1)
+        weighted = np.einsum('nk,nkc->nc', weights, cal_screen[closest])
+        
+        valid = np.isfinite(total_weight) & (total_weight > 0)
+        predictions[valid] = np.trunc(weighted[valid] / total_weight[valid, None])
+        predictions[valid, 0] = np.clip(predictions[valid, 0], 0, self.screen_width)
+        predictions[valid, 1] = np.clip(predictions[valid, 1], 0, self.screen_height)
+        return predictions
+    
     def save_calibration(self):
         calibration_file = Path("calibration_data.json")
         data = {
             'screen_width': self.screen_width,
             'screen_height': self.screen_height,
             'calibration_points': self.calibration_data,
+            'regression_model': self.regression_model,
             'timestamp': time.time()
         }
         
@@ -167,6 +315,17 @@ class CalibrationModule:
             json.dump(data, f, indent=2)
         print(f"Calibration saved to {calibration_file}")
     
+    def set_calibration_points(self, calibration_points):
+        # Calibration measured elsewhere (e.g. sent by a remote client), not saved to disk
+        self.calibration_data = [tuple(point) for point in calibration_points]
+        self.is_calibrated = len(self.calibration_data) >= 3
+        self.regression_model = None
+        self._clear_calibration_arrays()
+        if self.is_calibrated:
+            self._prepare_calibration_arrays()
+            self.fit_regression_model()
+        return self.is_calibrated
+    
     def load_calibration(self):
         calibration_file = Path("calibration_data.json")
         if calibration_file.exists():
@@ -178,6 +337,15 @@ class CalibrationModule:
                     data['screen_height'] == self.screen_height):
                     self.calibration_data = data['calibration_points']
                     self.is_calibrated = True
+                    self._clear_calibration_arrays()
+                    self._prepare_calibration_arrays()
+                    
+                    # Older calibration files have no fitted model yet
+                    if data.get('regression_model'):
+                        self.regression_model = data['regression_model']
+                        self._set_regression_arrays()
+                    else:
+                        self.fit_regression_model()
                     print("Previous calibration loaded successfully")
                     return True
                 else:
@@ -187,9 +355,56 @@ class CalibrationModule:
         
         return False
     
+    def save_pupil_thresholds(self, pupil_calibration, camera_id, user_id='default'):
+        # Learned pupil binarization thresholds, stored per camera and user
+        if not pupil_calibration.is_complete():
+            return False
+        
+        thresholds_file = Path("pupil_thresholds.json")
+        profiles = {}
+        if thresholds_file.exists():
+            try:
+                with open(thresholds_file, 'r') as f:
+                    profiles = json.load(f)
+            except Exception as e:
+                print(f"Failed to read pupil thresholds: {e}")
+        
+        profiles[f"{camera_id}|{user_id}"] = {
+            'left': pupil_calibration.threshold(0),
+            'right': pupil_calibration.threshold(1),
+            'timestamp': time.time()
+        }
+        
+        with open(thresholds_file, 'w') as f:
+            json.dump(profiles, f, indent=2)
+        return True
+    
+    def load_pupil_thresholds(self, pupil_calibration, camera_id, user_id='default'):
+        thresholds_file = Path("pupil_thresholds.json")
+        if not thresholds_file.exists():
+            return False
+        
+        try:
+            with open(thresholds_file, 'r') as f:
+                profiles = json.load(f)
+            
+            profile = profiles.get(f"{camera_id}|{user_id}")
+            if profile is None:
+                return False
+            
+            pupil_calibration.load_thresholds(profile['left'], profile['right'])
+            print("Pupil thresholds loaded")
+            return True
+        except Exception as e:
+            print(f"Failed to load pupil thresholds: {e}")
+        
+        return False
+    
     def reset_calibration(self):
         self.calibration_data = []
         self.is_calibrated = False
+        self.regression_model = None
+        self._clear_calibration_arrays()
     
     def get_calibration_status(self):
         return {
@@ -197,3 +412,65 @@ class CalibrationModule:
             'num_points': len(self.calibration_data),
             'screen_resolution': (self.screen_width, self.screen_height)
         }
+
+
+class CalibrationSampler:
+    def __init__(self, calibration_module, data_acquisition):
+        self.calibration_module = calibration_module
+        self.data_acquisition = data_acquisition
+        
+        # Samples of the point currently shown, filled by the capture thread
+        self.lock = threading.Lock()
+        self.active_point = None
+        self.point_samples = {}  # point index -> [(pupil_x, pupil_y, h_ratio, v_ratio), ...]
+        
+        self.is_running = False
+        self.error = None
+        self.thread = None
+    
+    def start(self):
+        self.is_running = True
+        self.thread = threading.Thread(target=self._sample_loop, daemon=True)
+        self.thread.start()
+    
+    def _sample_loop(self):
+        # Analyzes every frame, also between points, so pupil thresholds
+        # keep adapting while the user moves to the next dot
+        try:
+            while self.is_running:
+                frame_data = self.data_acquisition.get_frame_data()
+                if frame_data is None:
+                    break
+                
+                sample = self.calibration_module.calibration_sample(frame_data)
+                if sample:
+                    with self.lock:
+                        if self.active_point is not None:
+                            self.point_samples[self.active_point].append(sample)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.is_running = False
+    
+    def begin_point(self, point_index):
+        with self.lock:
+            self.point_samples[point_index] = []
+            self.active_point = point_index
+    
+    def sample_count(self):
+        with self.lock:
+            if self.active_point is None:
+                return 0
+            return len(self.point_samples[self.active_point])
+    
+    def end_point(self):
+        with self.lock:
+            samples = self.point_samples.get(self.active_point, [])
+            self.active_point = None
+        return samples
+    
+    def stop(self):
+        self.is_running = False
+        if self.thread:
+            self.thread.join(timeout=2.0)
+            self.thread = None
@@ -1,67 +1,213 @@
-import cv2
-import time
-from gaze_tracking import GazeTracking
+import threading
+from collections import deque
+from timing import StageTimer
+
+
+def frame_data_from_result(result, timestamp):
+    return {
+        'timestamp': timestamp,
+        'gaze_result': result,
+        'pupils_located': result.pupils_located,
+        'is_blinking': result.is_blinking,
+        'left_pupil': result.left_pupil,
+        'right_pupil': result.right_pupil,
+        'horizontal_ratio': result.horizontal_ratio,
+        'vertical_ratio': result.vertical_ratio,
+        'gaze_direction': {
+            'is_right': result.is_right,
+            'is_left': result.is_left,
+            'is_center': result.is_center
+        }
+    }
+
+
+def preload_tracking_models():
+    # Imports dlib and loads the face models on a background thread, so the
+    # load overlaps with the first dialogs instead of blocking them
+    def load():
+        try:
+            from gaze_tracking import models
+            models.preload()
+        except Exception as e:
+            print(f"Model preload failed: {e}")
+    
+    thread = threading.Thread(target=load, daemon=True)
+    thread.start()
+    return thread
 
 
 class DataAcquisition:
-    def __init__(self):
-        self.gaze_tracker = GazeTracking()
-        self.webcam = None
+    def __init__(self, threaded_capture=True, buffer_size=2, frame_source=None, timer=None, multi_face=False):
+        # Disabled timer by default, so the hooks cost next to nothing
+        self.timer = timer or StageTimer(enabled=False)
+        self._gaze_tracker = None  # Created on first use, loading dlib is slow
+        self.multi_face = multi_face  # Track every face, not only the first one
+        self.frame_source = frame_source  # Defaults to the first webcam
+        self.source = None  # The opened frame source
         self.is_running = False
         
+        # Capture thread keeps only the newest frames of live sources, older
+        # ones are dropped; recorded sources wait for the analysis instead
+        self.threaded_capture = threaded_capture
+        self.frame_buffer = deque(maxlen=buffer_size)
+        self.frame_ready = threading.Condition()
+        self.capture_thread = None
+        self.capture_ended = False
+        
+        # Capture counters
+        self.frames_captured = 0
+        self.frames_processed = 0
+        self.frames_dropped = 0
+        
+    @property
+    def gaze_tracker(self):
+        if self._gaze_tracker is None:
+            if self.multi_face:
+                from gaze_tracking import MultiFaceTracking
+                self._gaze_tracker = MultiFaceTracking(face_tracking=True, timer=self.timer)
+            else:
+                from gaze_tracking import GazeTracking
+                self._gaze_tracker = GazeTracking(face_tracking=True, timer=self.timer)
+        return self._gaze_tracker
+    
+    def has_gaze_tracker(self):
+        return self._gaze_tracker is not None
+    
     def initialize_camera(self):
-        self.webcam = cv2.VideoCapture(0)
-        if not self.webcam.isOpened():
-            raise RuntimeError("Could not open webcam")
+        from frame_sources import WebcamSource
+        source = self.frame_source or WebcamSource(0)
+        if not source.open():
+            raise RuntimeError(f"Could not open frame source {type(source).__name__}")
+        self.source = source
         return True
     
     def start_acquisition(self):
-        if not self.webcam:
+        if not self.source:
             self.initialize_camera()
         self.is_running = True
+        if self.multi_face and self._gaze_tracker is not None:
+            self._gaze_tracker.open()
+        
+        if self.threaded_capture and self.capture_thread is None:
+            self.frame_buffer.clear()
+            self.capture_ended = False
+            self.frames_captured = 0
+            self.frames_processed = 0
+            self.frames_dropped = 0
+            self.capture_thread = threading.Thread(target=self._capture_loop, daemon=True)
+            self.capture_thread.start()
         
     def stop_acquisition(self):
         self.is_running = False
-        if self.webcam:
-            self.webcam.release()
+        if self.multi_face and self._gaze_tracker is not None:
+            self._gaze_tracker.close()
+        
+        if self.capture_thread:
+            with self.frame_ready:
+                self.frame_ready.notify_all()
+            self.capture_thread.join(timeout=2.0)
+            self.capture_thread = None
+            
+        if self.source:
+            self.source.release()
+    
+    def _capture_loop(self):
+        source = self.source
+        while self.is_running:
+            captured = source.read()
+            
+            with self.frame_ready:
+                if captured is None:
+                    self.capture_ended = True
+                    self.frame_ready.notify_all()
+                    break
+                
+                if not source.live:
+                    while len(self.frame_buffer) == self.frame_buffer.maxlen and self.is_running:
+                        self.frame_ready.wait(timeout=0.5)
+                
+                # deque drops the oldest frame when full
+                if len(self.frame_buffer) == self.frame_buffer.maxlen:
+                    self.frames_dropped += 1
+                self.frame_buffer.append(captured)
+                self.frames_captured += 1
+                self.frame_ready.notify()
+    
+    def _next_frame(self):
+        if not self.threaded_capture:
+            captured = self.source.read()
+            if captured is not None:
+                self.frames_captured += 1
+            return captured
+        
+        with self.frame_ready:
+            while not self.frame_buffer:
+                if self.capture_ended or not self.is_running:
+                    return None
+                self.frame_ready.wait(timeout=0.5)
+            
+            if self.source.live:
+                # Only the newest frame gets analyzed
+                frame, timestamp = self.frame_buffer.pop()
+                self.frames_dropped += len(self.frame_buffer)
+                self.frame_buffer.clear()
+            else:
+                frame, timestamp = self.frame_buffer.popleft()
+            self.frame_ready.notify_all()
+        
+        return frame, timestamp
             
     def get_frame_data(self):
-        if not self.webcam or not self.is_running:
+        if not self.source or not self.is_running:
             return None
-            
-        ret, frame = self.webcam.read()
-        if not ret:
+        
+        start = self.timer.start()
+        captured = self._next_frame()
+        if captured is None:
             return None
+        frame, timestamp = captured
+        self.frames_processed += 1
+        start = self.timer.lap('acquisition.frame_wait', start)
             
         # Process frame
-        self.gaze_tracker.refresh(frame)
+        result = self.gaze_tracker.refresh(frame)
+        self.timer.lap('acquisition.gaze_tracking', start)
         
-        # Extract raw pupil and gaze data
-        frame_data = {
-            'timestamp': time.time(),
-            'frame': frame,
-            'annotated_frame': self.gaze_tracker.annotated_frame(),
-            'pupils_located': self.gaze_tracker.pupils_located,
-            'is_blinking': self.gaze_tracker.is_blinking(),
-            'left_pupil': self.gaze_tracker.pupil_left_coords(),
-            'right_pupil': self.gaze_tracker.pupil_right_coords(),
-            'horizontal_ratio': self.gaze_tracker.horizontal_ratio(),
-            'vertical_ratio': self.gaze_tracker.vertical_ratio(),
-            'gaze_direction': {
-                'is_right': self.gaze_tracker.is_right(),
-                'is_left': self.gaze_tracker.is_left(),
-                'is_center': self.gaze_tracker.is_center()
-            }
-        }
+        # Extract raw pupil and gaze data; consumers that display the frame
+        # draw the pupils themselves from 'gaze_result'
+        if self.multi_face:
+            # Top-level fields describe the calibrated face, and are empty
+            # while that face is out of view
+            frame_data = frame_data_from_result(self.gaze_tracker.result, timestamp)
+            frame_data['primary_face_id'] = self.gaze_tracker.primary_face_id
+            frame_data['faces'] = {face_id: frame_data_from_result(face_result, timestamp)
+                                   for face_id, face_result in result.items()}
+        else:
+            frame_data = frame_data_from_result(result, timestamp)
+        frame_data['frame'] = frame
         
         return frame_data
     
+    def get_capture_stats(self):
+        return {
+            'frames_captured': self.frames_captured,
+            'frames_processed': self.frames_processed,
+            'frames_dropped': self.frames_dropped,
+            'drop_ratio': self.frames_dropped / max(1, self.frames_captured)
+        }
+    
+    def get_source_id(self):
+        from frame_sources import WebcamSource
+        source = self.source or self.frame_source
+        return source.source_id if source else WebcamSource(0).source_id
+    
     def get_gaze_tracker(self):
         return self.gaze_tracker
     
     def is_camera_ready(self):
-        return self.webcam is not None and self.webcam.isOpened()
+        return self.source is not None and self.source.is_opened()
     
     def cleanup(self):
+        import cv2
         self.stop_acquisition()
         cv2.destroyAllWindows()
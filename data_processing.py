@@ -1,10 +1,24 @@
 import time
 import numpy as np
 from collections import deque
+from gaze_store import ColumnarStore
+
+
+def analyze_frame(calibration, processing, frame_data):
+    # The per-frame pipeline shared by every entry point: screen gaze from the
+    # calibration (if calibrated and the pupils were found), then the session
+    # analysis. Returns the gaze position, or None
+    gaze_position = None
+    if calibration is not None and calibration.is_calibrated and frame_data['pupils_located']:
+        gaze_position = calibration.predict_gaze_position(
+            frame_data['left_pupil'], frame_data['right_pupil'], frame_data['gaze_result']
+        )
+    processing.process_frame(frame_data, gaze_position)
+    return gaze_position
 
 
 class DataProcessing:
-    def __init__(self, screen_width=1920, screen_height=1080):
+    def __init__(self, screen_width=1920, screen_height=1080, max_stored_samples=None, spill_path=None):
         self.screen_width = screen_width
         self.screen_height = screen_height
         self.screen_center_x = screen_width // 2
@@ -12,8 +26,10 @@ class DataProcessing:
         
         # Data storage
         self.blink_count = 0
-        self.gaze_positions = []
-        self.gaze_velocities = []
+        # Columnar sample storage, optionally capped with older rows spilled to disk
+        self.gaze_positions = ColumnarStore(('x', 'y', 'timestamp'), max_samples=max_stored_samples,
+                                            spill_path=spill_path)
+        self.gaze_velocities = ColumnarStore(('velocity', 'timestamp'), max_samples=max_stored_samples)
         self.saccade_count = 0
         
         # Precise blink tracking
@@ -24,10 +40,23 @@ class DataProcessing:
         
         # Session tracking
         self.session_start = time.time()
+        self.session_end = None  # Fixed end time for recorded sessions
         self.frame_count = 0
         self.center_gaze_count = 0
         self.edge_gaze_count = 0
         
+        # Running accumulators so live analysis doesn't rescan the session
+        self.center_distance_sum = 0.0
+        self.look_away_events = 0
+        self.was_center = False
+        self.velocity_sum = 0.0
+        self.blink_duration_sum = 0.0
+        
+        # Welford state for variance of consecutive blink duration differences
+        self.blink_diff_count = 0
+        self.blink_diff_mean = 0.0
+        self.blink_diff_m2 = 0.0
+        
         # Thresholds and parameters
         self.anxiety_blink_rate = 30  # blinks per minute
         self.anxiety_saccade_rate = 6  # saccades per second
@@ -67,12 +96,22 @@ class DataProcessing:
             # Blink ended
             if self.blink_start_time:
                 blink_duration = current_time - self.blink_start_time
+                if self.blink_durations:
+                    self._update_blink_variance(blink_duration - self.blink_durations[-1])
                 self.blink_durations.append(blink_duration)
+                self.blink_duration_sum += blink_duration
                 self.blink_count += 1
                 self.last_blink_time = current_time
             self.is_currently_blinking = False
             self.blink_start_time = None
     
+    def _update_blink_variance(self, difference):
+        # Welford's online update, matches np.var (ddof=0) over all differences
+        self.blink_diff_count += 1
+        delta = difference - self.blink_diff_mean
+        self.blink_diff_mean += delta / self.blink_diff_count
+        self.blink_diff_m2 += delta * (difference - self.blink_diff_mean)
+    
     def process_gaze_position(self, gaze_position, timestamp):
         if gaze_position is None:
             return
@@ -82,7 +121,7 @@ class DataProcessing:
         if smoothed_position is None:
             return
             
-        self.gaze_positions.append((smoothed_position, timestamp))
+        self.gaze_positions.append(smoothed_position[0], smoothed_position[1], timestamp)
         
         # Calculate gaze velocity and detect saccades
         if len(self.recent_gazes) > 0:
@@ -93,7 +132,8 @@ class DataProcessing:
             
             if time_diff > 0:
                 velocity = distance / time_diff
-                self.gaze_velocities.append(velocity)
+                self.gaze_velocities.append(velocity, timestamp)
+                self.velocity_sum += velocity
                 
                 # Detect saccades (rapid eye movements)
                 if velocity > self.saccade_velocity_threshold:
@@ -107,8 +147,15 @@ class DataProcessing:
         center_distance = np.sqrt((gaze_position[0] - self.screen_center_x)**2 + 
                                 (gaze_position[1] - self.screen_center_y)**2)
         
-        if center_distance <= self.center_zone_radius:
+        is_center = center_distance <= self.center_zone_radius
+        if is_center:
             self.center_gaze_count += 1
+            self.center_distance_sum += center_distance
+        
+        # Count transitions from center to elsewhere
+        if self.was_center and not is_center:
+            self.look_away_events += 1
+        self.was_center = is_center
         
         # Check if looking at screen edges (avoidance behavior)
         if (gaze_position[0] <= self.edge_zone_margin or 
@@ -125,68 +172,146 @@ class DataProcessing:
         if gaze_position:
             self.process_gaze_position(gaze_position, frame_data['timestamp'])
     
+    def process_session(self, timestamps, blink_flags, gaze_xy):
+        # Vectorized equivalent of calling process_frame for every frame of a
+        # recorded session. gaze_xy is (N, 2) with NaN rows where no gaze
+        # position was available. Starts a new session and returns its analysis.
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        blink_flags = np.asarray(blink_flags, dtype=bool)
+        gaze_xy = np.asarray(gaze_xy, dtype=np.float64).reshape(-1, 2)
+        
+        start_time = timestamps[0] if len(timestamps) else None
+        self.reset_session(start_time=start_time)
+        if len(timestamps) == 0:
+            return self.get_comprehensive_analysis()
+        
+        self.frame_count = len(timestamps)
+        self._process_blink_array(timestamps, blink_flags)
+        
+        valid = ~np.isnan(gaze_xy).any(axis=1)
+        if valid.any():
+            self._process_gaze_array(gaze_xy[valid], timestamps[valid])
+        
+        self.end_session(timestamps[-1])
+        return self.get_comprehensive_analysis()
+    
+    def _process_blink_array(self, timestamps, blink_flags):
+        previous = np.concatenate(([False], blink_flags[:-1]))
+        starts = np.flatnonzero(blink_flags & ~previous)
+        ends = np.flatnonzero(~blink_flags & previous)
+        
+        # Blinks are only counted with a (truthy) start time, as in process_blink_data
+        start_times = timestamps[starts[:len(ends)]]
+        counted = start_times != 0
+        durations = timestamps[ends][counted] - start_times[counted]
+        
+        for duration in durations:
+            if self.blink_durations:
+                self._update_blink_variance(duration - self.blink_durations[-1])
+            self.blink_durations.append(float(duration))
+        
+        self.blink_count = len(durations)
+        if len(durations):
+            self.blink_duration_sum = float(np.cumsum(durations)[-1])
+            self.last_blink_time = float(timestamps[ends][counted][-1])
+        
+        # A blink still open at the end of the recording
+        if len(starts) > len(ends):
+            self.is_currently_blinking = True
+            self.blink_start_time = float(timestamps[starts[-1]])
+    
+    def _process_gaze_array(self, gaze_xy, timestamps):
+        # Moving average over the last gaze_smoothing_window positions, used
+        # from the third position on (like smooth_gaze_data)
+        window = self.gaze_smoothing_window
+        sums = np.cumsum(np.vstack(([0.0, 0.0], gaze_xy)), axis=0)
+        indices = np.arange(len(gaze_xy))
+        window_start = np.maximum(0, indices - window + 1)
+        counts = (indices - window_start + 1)[:, None]
+        smoothed = np.trunc((sums[indices + 1] - sums[window_start]) / counts)
+        smoothed[:2] = gaze_xy[:2]
+        
+        self.smoothed_positions.extend(tuple(position) for position in gaze_xy[-window:])
+        self.gaze_positions.extend(smoothed[:, 0], smoothed[:, 1], timestamps)
+        
+        # Velocities and saccades between consecutive positions
+        steps = np.diff(smoothed, axis=0)
+        distances = np.sqrt(steps[:, 0]**2 + steps[:, 1]**2)
+        time_diffs = np.diff(timestamps)
+        moving = time_diffs > 0
+        velocities = distances[moving] / time_diffs[moving]
+        
+        self.gaze_velocities.extend(velocities, timestamps[1:][moving])
+        self.saccade_count = int(np.count_nonzero(velocities > self.saccade_velocity_threshold))
+        if len(velocities):
+            self.velocity_sum = float(np.cumsum(velocities)[-1])
+        
+        self.recent_gazes.extend(
+            (tuple(position), timestamp)
+            for position, timestamp in zip(smoothed[-self.recent_gazes.maxlen:],
+                                           timestamps[-self.recent_gazes.maxlen:])
+        )
+        
+        # Gaze zones and look-away transitions
+        center_distances = np.sqrt((smoothed[:, 0] - self.screen_center_x)**2 + 
+                                   (smoothed[:, 1] - self.screen_center_y)**2)
+        is_center = center_distances <= self.center_zone_radius
+        self.center_gaze_count = int(np.count_nonzero(is_center))
+        if self.center_gaze_count:
+            self.center_distance_sum = float(np.cumsum(center_distances[is_center])[-1])
+        
+        was_center = np.concatenate(([False], is_center[:-1]))
+        self.look_away_events = int(np.count_nonzero(was_center & ~is_center))
+        self.was_center = bool(is_center[-1])
+        
+        margin = self.edge_zone_margin
+        is_edge = ((smoothed[:, 0] <= margin) | (smoothed[:, 0] >= self.screen_width - margin) |
+                   (smoothed[:, 1] <= margin) | (smoothed[:, 1] >= self.screen_height - margin))
+        self.edge_gaze_count = int(np.count_nonzero(is_edge))
+    
     def calculate_center_gaze_accuracy(self):
-        if not self.gaze_positions:
-            return 0.0
-            
-        center_positions = []
-        for pos, _ in self.gaze_positions:
-            distance = np.sqrt((pos[0] - self.screen_center_x)**2 + 
-                             (pos[1] - self.screen_center_y)**2)
-            if distance <= self.center_zone_radius:
-                center_positions.append(distance)
-        
-        if not center_positions:
+        if self.gaze_positions.total_count == 0 or self.center_gaze_count == 0:
             return 0.0
             
         # Calculate accuracy 
-        avg_distance = np.mean(center_positions)
+        avg_distance = self.center_distance_sum / self.center_gaze_count
         max_distance = self.center_zone_radius
         accuracy = (max_distance - avg_distance) / max_distance
         return max(0.0, accuracy)
     
     def calculate_look_away_frequency(self):
-        if len(self.gaze_positions) < 2:
+        if self.gaze_positions.total_count < 2:
             return 0.0
-            
-        look_away_events = 0
-        was_center = False
-        
-        for pos, _ in self.gaze_positions:
-            distance = np.sqrt((pos[0] - self.screen_center_x)**2 + 
-                             (pos[1] - self.screen_center_y)**2)
-            is_center = distance <= self.center_zone_radius
-            
-            if was_center and not is_center:
-                look_away_events += 1
-                
-            was_center = is_center
         
-        session_duration = (time.time() - self.session_start) / 60  # minutes
-        return look_away_events / max(0.1, session_duration)  # events per minute
+        session_duration = self.get_session_minutes()
+        return self.look_away_events / max(0.1, session_duration)  # events per minute
+    
+    def get_session_minutes(self):
+        end_time = self.session_end if self.session_end is not None else time.time()
+        return (end_time - self.session_start) / 60
     
     def get_comprehensive_analysis(self):
-        session_duration = (time.time() - self.session_start) / 60  # minutes
+        session_duration = self.get_session_minutes()
         
         # Calculate metrics
         blink_rate = self.blink_count / session_duration if session_duration > 0 else 0
         saccade_rate = self.saccade_count / session_duration if session_duration > 0 else 0
         
-        center_gaze_ratio = self.center_gaze_count / max(1, len(self.gaze_positions))
-        edge_gaze_ratio = self.edge_gaze_count / max(1, len(self.gaze_positions))
+        total_positions = self.gaze_positions.total_count
+        center_gaze_ratio = self.center_gaze_count / max(1, total_positions)
+        edge_gaze_ratio = self.edge_gaze_count / max(1, total_positions)
         
-        avg_velocity = np.mean(self.gaze_velocities) if self.gaze_velocities else 0
-        avg_blink_duration = np.mean(self.blink_durations) if self.blink_durations else 0
+        total_velocities = self.gaze_velocities.total_count
+        avg_velocity = self.velocity_sum / total_velocities if total_velocities else 0
+        avg_blink_duration = self.blink_duration_sum / len(self.blink_durations) if self.blink_durations else 0
         
         # Calculate advanced metrics
         center_accuracy = self.calculate_center_gaze_accuracy()
         look_away_frequency = self.calculate_look_away_frequency()
         
         # Blink pattern analysis
-        blink_frequency_variance = np.var([
-            self.blink_durations[i] - self.blink_durations[i-1] 
-            for i in range(1, len(self.blink_durations))
-        ]) if len(self.blink_durations) > 1 else 0
+        blink_frequency_variance = (self.blink_diff_m2 / self.blink_diff_count 
+                                    if self.blink_diff_count > 0 else 0)
         
         # Anxiety scoring
         anxiety_indicators = []
@@ -263,22 +388,69 @@ class DataProcessing:
             'saccade_count': self.saccade_count,
             'saccade_rate': saccade_rate,
             'avg_gaze_velocity': avg_velocity,
-            'total_gaze_positions': len(self.gaze_positions),
+            'total_gaze_positions': total_positions,
             'indicators': anxiety_indicators
         }
     
-    def reset_session(self):
+    def end_session(self, end_time=None):
+        self.session_end = end_time if end_time is not None else time.time()
+    
+    def reset_session(self, start_time=None):
         self.blink_count = 0
-        self.gaze_positions = []
-        self.gaze_velocities = []
+        self.gaze_positions.clear()
+        self.gaze_velocities.clear()
         self.saccade_count = 0
         self.blink_durations = []
         self.last_blink_time = None
         self.is_currently_blinking = False
         self.blink_start_time = None
-        self.session_start = time.time()
+        self.session_start = start_time if start_time is not None else time.time()
+        self.session_end = None
         self.frame_count = 0
         self.center_gaze_count = 0
         self.edge_gaze_count = 0
+        self.center_distance_sum = 0.0
+        self.look_away_events = 0
+        self.was_center = False
+        self.velocity_sum = 0.0
+        self.blink_duration_sum = 0.0
+        self.blink_diff_count = 0
+        self.blink_diff_mean = 0.0
+        self.blink_diff_m2 = 0.0
         self.recent_gazes.clear()
         self.smoothed_positions.clear()
+
+
+class MultiSubjectProcessing:
+    def __init__(self, screen_width=1920, screen_height=1080, max_stored_samples=None):
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self.max_stored_samples = max_stored_samples
+        self.subjects = {}  # face id -> DataProcessing
+    
+    def get_subject(self, face_id, start_time=None):
+        # A subject's session starts when their face is first seen
+        processing = self.subjects.get(face_id)
+        if processing is None:
+            processing = DataProcessing(self.screen_width, self.screen_height, self.max_stored_samples)
+            processing.reset_session(start_time)
+            self.subjects[face_id] = processing
+        return processing
+    
+    def process_faces(self, faces, gaze_positions=None):
+        # faces: face id -> frame data, gaze_positions: face id -> screen position
+        gaze_positions = gaze_positions or {}
+        for face_id, frame_data in faces.items():
+            processing = self.get_subject(face_id, frame_data['timestamp'])
+            processing.process_frame(frame_data, gaze_positions.get(face_id))
+    
+    def get_analyses(self):
+        return {face_id: processing.get_comprehensive_analysis()
+                for face_id, processing in self.subjects.items()}
+    
+    def end_session(self, end_time=None):
+        for processing in self.subjects.values():
+            processing.end_session(end_time)
+    
+    def reset_session(self):
+        self.subjects = {}
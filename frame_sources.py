@@ -0,0 +1,170 @@
+import abc
+import time
+import cv2
+from pathlib import Path
+
+
+class FrameSource(abc.ABC):
+    # Live sources drop frames when analysis falls behind, recorded ones wait
+    live = False
+
+    def __init__(self, realtime=False):
+        self.realtime = realtime  # Pace recorded frames to their timestamps
+        self.start_time = None
+        self._wall_start = None
+
+    def open(self):
+        self.start_time = time.time()
+        self._wall_start = time.perf_counter()
+        return True
+
+    @property
+    def source_id(self):
+        # Identifies the camera for per-camera settings
+        return type(self).__name__
+
+    def is_opened(self):
+        return self.start_time is not None
+
+    @abc.abstractmethod
+    def read(self):
+        # Returns (frame, timestamp) or None when the source is exhausted
+        pass
+
+    def release(self):
+        self.start_time = None
+
+    def _timestamped(self, frame, media_time):
+        if self.realtime:
+            delay = media_time - (time.perf_counter() - self._wall_start)
+            if delay > 0:
+                time.sleep(delay)
+        return frame, self.start_time + media_time
+
+
+class WebcamSource(FrameSource):
+    live = True
+
+    def __init__(self, device_index=0):
+        super().__init__(realtime=False)
+        self.device_index = device_index
+        self.capture = None
+
+    @property
+    def source_id(self):
+        return f"webcam:{self.device_index}"
+
+    def open(self):
+        self.capture = cv2.VideoCapture(self.device_index)
+        if not self.capture.isOpened():
+            return False
+        return super().open()
+
+    def is_opened(self):
+        return self.capture is not None and self.capture.isOpened()
+
+    def read(self):
+        ret, frame = self.capture.read()
+        if not ret:
+            return None
+        return frame, time.time()
+
+    def release(self):
+        if self.capture:
+            self.capture.release()
+        super().release()
+
+
+class VideoFileSource(FrameSource):
+    def __init__(self, path, realtime=False):
+        super().__init__(realtime)
+        self.path = str(path)
+        self.capture = None
+        self.fps = None
+        self.frame_index = 0
+
+    @property
+    def source_id(self):
+        return f"video:{Path(self.path).name}"
+
+    def open(self):
+        self.capture = cv2.VideoCapture(self.path)
+        if not self.capture.isOpened():
+            return False
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS) or 30.0
+        self.frame_index = 0
+        return super().open()
+
+    def is_opened(self):
+        return self.capture is not None and self.capture.isOpened()
+
+    def read(self):
+        ret, frame = self.capture.read()
+        if not ret:
+            return None
+        media_time = self.frame_index / self.fps
+        self.frame_index += 1
+        return self._timestamped(frame, media_time)
+
+    def release(self):
+        if self.capture:
+            self.capture.release()
+        super().release()
+
+
+class ImageSequenceSource(FrameSource):
+    def __init__(self, directory, pattern="*.png", fps=30.0, realtime=False):
+        super().__init__(realtime)
+        self.directory = Path(directory)
+        self.pattern = pattern
+        self.fps = fps
+        self.paths = []
+        self.frame_index = 0
+
+    @property
+    def source_id(self):
+        return f"images:{self.directory.name}"
+
+    def open(self):
+        self.paths = sorted(self.directory.glob(self.pattern))
+        if not self.paths:
+            return False
+        self.frame_index = 0
+        return super().open()
+
+    def read(self):
+        while self.frame_index < len(self.paths):
+            path = self.paths[self.frame_index]
+            media_time = self.frame_index / self.fps
+            self.frame_index += 1
+
+            frame = cv2.imread(str(path))
+            if frame is not None:
+                return self._timestamped(frame, media_time)
+            print(f"Skipping unreadable image {path}")
+        return None
+
+
+class ArraySource(FrameSource):
+    def __init__(self, frames, fps=30.0, timestamps=None, realtime=False):
+        super().__init__(realtime)
+        self.frames = frames
+        self.fps = fps
+        self.timestamps = timestamps  # Optional media times in seconds
+        self.frame_index = 0
+
+    def open(self):
+        self.frame_index = 0
+        return super().open()
+
+    def read(self):
+        if self.frame_index >= len(self.frames):
+            return None
+
+        frame = self.frames[self.frame_index]
+        if self.timestamps is not None:
+            media_time = self.timestamps[self.frame_index]
+        else:
+            media_time = self.frame_index / self.fps
+        self.frame_index += 1
+        return self._timestamped(frame, media_time)
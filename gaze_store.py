@@ -0,0 +1,137 @@
+import numpy as np
+from pathlib import Path
+
+
+class ColumnarStore:
+    def __init__(self, columns, chunk_size=4096, max_samples=None, spill_path=None):
+        self.columns = tuple(columns)
+        self.chunk_size = chunk_size
+        self.max_samples = max_samples  # None keeps everything
+        self.spill_path = Path(spill_path) if spill_path else None
+
+        # Retained rows live in [start, end) of each column block; rows in
+        # [head, start) are past the cap and wait for the next compaction
+        # to be spilled
+        self._data = {name: np.empty(chunk_size, dtype=np.float64) for name in self.columns}
+        self._head = 0
+        self._start = 0
+        self._end = 0
+        self.total_count = 0
+        self.spilled_count = 0
+
+        if self.spill_path and self.spill_path.exists():
+            self.spill_path.unlink()
+
+    @property
+    def capacity(self):
+        return len(self._data[self.columns[0]])
+
+    def __len__(self):
+        return self._end - self._start
+
+    def append(self, *values):
+        if self._end >= self.capacity:
+            self._make_room()
+
+        for name, value in zip(self.columns, values):
+            self._data[name][self._end] = value
+        self._end += 1
+        self.total_count += 1
+        self._enforce_cap()
+
+    def extend(self, *columns):
+        # Bulk append of whole columns, written in place block by block
+        columns = [np.asarray(values, dtype=np.float64) for values in columns]
+        count = len(columns[0])
+        offset = 0
+
+        while offset < count:
+            if self._end >= self.capacity:
+                self._make_room(count - offset)
+
+            block = min(count - offset, self.capacity - self._end)
+            for name, values in zip(self.columns, columns):
+                self._data[name][self._end:self._end + block] = values[offset:offset + block]
+            self._end += block
+            self.total_count += block
+            offset += block
+            self._enforce_cap()
+
+    def _enforce_cap(self):
+        # Never more than max_samples rows visible; memory is reclaimed later
+        if self.max_samples is not None and len(self) > self.max_samples:
+            self._start = self._end - self.max_samples
+
+    def _make_room(self, needed=1):
+        retained = len(self)
+
+        if self.max_samples is None:
+            # Grow by as many chunks as needed
+            chunks = max(1, -(-needed // self.chunk_size))
+            new_capacity = self.capacity + self.chunk_size * chunks
+            for name in self.columns:
+                block = np.empty(new_capacity, dtype=np.float64)
+                block[:retained] = self._data[name][self._start:self._end]
+                self._data[name] = block
+            self._start, self._end = 0, retained
+            return
+
+        # Spill the rows dropped by the cap, then compact to the front
+        self._spill_dropped()
+
+        target_capacity = self.max_samples + self.chunk_size
+        for name in self.columns:
+            column = self._data[name]
+            if len(column) < target_capacity:
+                block = np.empty(target_capacity, dtype=np.float64)
+                block[:retained] = column[self._start:self._end]
+                self._data[name] = block
+            else:
+                column[:retained] = column[self._start:self._end].copy()
+        self._head, self._start, self._end = 0, 0, retained
+
+    def _spill_dropped(self):
+        if self._start > self._head:
+            self._spill(self._head, self._start)
+            self._head = self._start
+
+    def _spill(self, start, end):
+        if self.spill_path is None:
+            return
+
+        rows = np.column_stack([self._data[name][start:end] for name in self.columns])
+        with open(self.spill_path, 'ab') as f:
+            rows.tofile(f)
+        self.spilled_count += end - start
+
+    def column(self, name):
+        # Zero-copy view over the retained rows
+        return self._data[name][self._start:self._end]
+
+    def columns_view(self):
+        return {name: self.column(name) for name in self.columns}
+
+    def last(self):
+        if len(self) == 0:
+            return None
+        return tuple(self._data[name][self._end - 1] for name in self.columns)
+
+    def load_spilled(self):
+        self._spill_dropped()
+        if self.spill_path is None or not self.spill_path.exists():
+            return np.empty((0, len(self.columns)))
+        return np.fromfile(self.spill_path, dtype=np.float64).reshape(-1, len(self.columns))
+
+    def memory_bytes(self):
+        return sum(block.nbytes for block in self._data.values())
+
+    def clear(self):
+        self._data = {name: np.empty(self.chunk_size, dtype=np.float64) for name in self.columns}
+        self._head = 0
+        self._start = 0
+        self._end = 0
+        self.total_count = 0
+        self.spilled_count = 0
+
+        if self.spill_path and self.spill_path.exists():
+            self.spill_path.unlink()
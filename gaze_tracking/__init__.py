@@ -1 +1,14 @@
-from .gaze_tracking import GazeTracking
+from .gaze_result import GazeResult
+
+
+def __getattr__(name):
+    # The trackers pull in dlib and load the face models, so they are only
+    # imported when used: code that just handles GazeResult rows (the feature
+    # streams of analysis_server.py) doesn't need dlib at all
+    if name == 'GazeTracking':
+        from .gaze_tracking import GazeTracking
+        return GazeTracking
+    if name == 'MultiFaceTracking':
+        from .multi_face import MultiFaceTracking
+        return MultiFaceTracking
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,4 +1,5 @@
 from __future__ import division
+import numpy as np
 import cv2
 from .pupil import Pupil
 
@@ -13,6 +14,10 @@ class Calibration(object):
         self.nb_frames = 20
         self.thresholds_left = []
         self.thresholds_right = []
+        self.validation_tolerance = 0.15
+        self.validation_frames = 5
+        self._unvalidated = set()
+        self._validation_sizes = {0: [], 1: []}
 
     def is_complete(self):
         """Returns true if the calibration is completed"""
@@ -29,6 +34,50 @@ class Calibration(object):
         elif side == 1:
             return int(sum(self.thresholds_right) / len(self.thresholds_right))
 
+    def load_thresholds(self, left, right):
+        """Starts from previously learned thresholds instead of learning
+        them again. Each side is checked on the next few eye frames and the
+        calibration falls back to learning if the check fails.
+
+        Arguments:
+            left (int): Threshold of the left eye
+            right (int): Threshold of the right eye
+        """
+        self.thresholds_left = [left] * self.nb_frames
+        self.thresholds_right = [right] * self.nb_frames
+        self._unvalidated = {0, 1}
+        self._validation_sizes = {0: [], 1: []}
+
+    def needs_validation(self, side):
+        """Returns true if the loaded threshold of this eye hasn't been checked yet"""
+        return side in self._unvalidated
+
+    def validate(self, eye_frame, side):
+        """Checks that a loaded threshold still produces a plausible iris size,
+        and restarts the calibration if it doesn't. The decision uses the
+        median iris size of validation_frames eye frames, so a blink or a
+        glance away in one of them doesn't discard the thresholds.
+
+        Arguments:
+            eye_frame (numpy.ndarray): Frame of the eye
+            side: Indicates whether it's the left eye (0) or the right eye (1)
+        """
+        average_iris_size = 0.48
+        iris_frame = Pupil.image_processing(eye_frame, self.threshold(side))
+        sizes = self._validation_sizes[side]
+        sizes.append(self.iris_size(iris_frame))
+        if len(sizes) < self.validation_frames:
+            return
+
+        if abs(np.median(sizes) - average_iris_size) > self.validation_tolerance:
+            self.thresholds_left = []
+            self.thresholds_right = []
+            self._unvalidated = set()
+            self._validation_sizes = {0: [], 1: []}
+        else:
+            self._unvalidated.discard(side)
+            sizes.clear()
+
     @staticmethod
     def iris_size(frame):
         """Returns the percentage of space that the iris takes up on
@@ -48,18 +97,24 @@ class Calibration(object):
         """Calculates the optimal threshold to binarize the
         frame for the given eye.
 
+        The frame is filtered once, then the iris size for every candidate
+        threshold is read from the cumulative histogram of the filtered frame,
+        since binarization keeps as black every pixel at or below the threshold.
+
         Argument:
             eye_frame (numpy.ndarray): Frame of the eye to be analyzed
         """
         average_iris_size = 0.48
-        trials = {}
+        thresholds = np.arange(5, 100, 5)
 
-        for threshold in range(5, 100, 5):
-            iris_frame = Pupil.image_processing(eye_frame, threshold)
-            trials[threshold] = Calibration.iris_size(iris_frame)
+        filtered = Pupil.filter_frame(eye_frame)[5:-5, 5:-5]
+        nb_pixels = filtered.size
+        histogram = np.bincount(filtered.ravel(), minlength=256)
+        nb_blacks = np.cumsum(histogram)[thresholds]
 
-        best_threshold, iris_size = min(trials.items(), key=(lambda p: abs(p[1] - average_iris_size)))
-        return best_threshold
+        iris_sizes = nb_blacks / nb_pixels
+        best_index = np.argmin(np.abs(iris_sizes - average_iris_size))
+        return int(thresholds[best_index])
 
     def evaluate(self, eye_frame, side):
         """Improves calibration by taking into consideration the
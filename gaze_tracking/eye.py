@@ -46,21 +46,31 @@ class Eye(object):
         region = region.astype(np.int32)
         self.landmark_points = region
 
-        # Applying a mask to get only the eye
-        height, width = frame.shape[:2]
-        black_frame = np.zeros((height, width), np.uint8)
-        mask = np.full((height, width), 255, np.uint8)
-        cv2.fillPoly(mask, [region], (0, 0, 0))
-        eye = cv2.bitwise_not(black_frame, frame.copy(), mask=mask)
-
-        # Cropping on the eye
+        # Cropping on the eye first, so only the small region gets copied
         margin = 5
         min_x = np.min(region[:, 0]) - margin
         max_x = np.max(region[:, 0]) + margin
         min_y = np.min(region[:, 1]) - margin
         max_y = np.max(region[:, 1]) + margin
 
-        self.frame = eye[min_y:max_y, min_x:max_x]
+        if min_x < 0 or min_y < 0:
+            # The eye runs off the frame edge, keep the full-frame mask so the
+            # (wrapped) crop stays the same as before
+            height, width = frame.shape[:2]
+            black_frame = np.zeros((height, width), np.uint8)
+            mask = np.full((height, width), 255, np.uint8)
+            cv2.fillPoly(mask, [region], (0, 0, 0))
+            eye = cv2.bitwise_not(black_frame, frame.copy(), mask=mask)
+            eye = eye[min_y:max_y, min_x:max_x]
+        else:
+            # Applying a mask in crop coordinates to get only the eye
+            eye = frame[min_y:max_y, min_x:max_x].copy()
+            if eye.size:
+                mask = np.zeros(eye.shape[:2], np.uint8)
+                cv2.fillPoly(mask, [region - np.array([min_x, min_y], np.int32)], 255)
+                eye[mask == 0] = 255
+
+        self.frame = eye
         self.origin = (min_x, min_y)
 
         height, width = self.frame.shape[:2]
@@ -114,6 +124,10 @@ class Eye(object):
 
         if not calibration.is_complete():
             calibration.evaluate(self.frame, side)
+        elif calibration.needs_validation(side):
+            calibration.validate(self.frame, side)
+            if not calibration.is_complete():
+                calibration.evaluate(self.frame, side)
 
         threshold = calibration.threshold(side)
         self.pupil = Pupil(self.frame, threshold)
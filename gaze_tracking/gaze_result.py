@@ -0,0 +1,18 @@
+from typing import NamedTuple, Optional, Tuple
+
+
+class GazeResult(NamedTuple):
+    """
+    Immutable snapshot of everything GazeTracking knows about one frame.
+    Values that need located pupils are None when the pupils were not found.
+    """
+
+    pupils_located: bool = False
+    left_pupil: Optional[Tuple[int, int]] = None
+    right_pupil: Optional[Tuple[int, int]] = None
+    horizontal_ratio: Optional[float] = None
+    vertical_ratio: Optional[float] = None
+    is_blinking: Optional[bool] = None
+    is_right: Optional[bool] = None
+    is_left: Optional[bool] = None
+    is_center: Optional[bool] = None
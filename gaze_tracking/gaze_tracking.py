@@ -1,9 +1,9 @@
 from __future__ import division
-import os
 import cv2
-import dlib
 from .eye import Eye
 from .calibration import Calibration
+from .gaze_result import GazeResult
+from . import models
 
 
 class GazeTracking(object):
@@ -13,23 +13,48 @@ class GazeTracking(object):
     and pupils and allows to know if the eyes are open or closed
     """
 
-    def __init__(self):
+    def __init__(self, face_tracking=False, detection_interval=10, roi_margin=0.5, detection_scale=1.0,
+                 timer=None):
+        """
+        Arguments:
+            face_tracking (bool): Search for the face around its previous position
+                instead of scanning the whole frame every time
+            detection_interval (int): Number of tracked frames before a full-frame
+                detection is forced again
+            roi_margin (float): Margin added around the previous face box, as a
+                fraction of its size
+            detection_scale (float): Scale applied to the image before face
+                detection; landmarks and pupils still use the full resolution
+            timer: Optional stage timer (with start() and lap(stage, start))
+                that receives the duration of each analysis step
+        """
         self.frame = None
         self.eye_left = None
         self.eye_right = None
+        self.result = GazeResult()
         self.calibration = Calibration()
 
-        # _face_detector is used to detect faces
-        self._face_detector = dlib.get_frontal_face_detector()
+        self.face_tracking = face_tracking
+        self.detection_interval = detection_interval
+        self.roi_margin = roi_margin
+        self.timer = timer
+        self._face_box = None
+        self._frames_since_detection = 0
+
+        # _detector is used to detect faces
+        self._detector = models.FaceDetector(detection_scale)
 
         # _predictor is used to get facial landmarks of a given face
-        cwd = os.path.abspath(os.path.dirname(__file__))
-        model_path = os.path.abspath(os.path.join(cwd, "trained_models/shape_predictor_68_face_landmarks.dat"))
-        self._predictor = dlib.shape_predictor(model_path)
+        # (both are loaded once per process and shared between trackers)
+        self._predictor = models.get_shape_predictor()
 
     @property
     def pupils_located(self):
         """Check that the pupils have been located"""
+        return self.result.pupils_located
+
+    def _pupils_found(self):
+        """Checks the Eye objects for located pupils"""
         try:
             int(self.eye_left.pupil.x)
             int(self.eye_left.pupil.y)
@@ -39,95 +64,195 @@ class GazeTracking(object):
         except Exception:
             return False
 
+    def _compute_result(self):
+        """Builds the GazeResult of the current frame from the Eye objects"""
+        if not self._pupils_found():
+            return GazeResult()
+
+        left_pupil = (self.eye_left.origin[0] + self.eye_left.pupil.x,
+                      self.eye_left.origin[1] + self.eye_left.pupil.y)
+        right_pupil = (self.eye_right.origin[0] + self.eye_right.pupil.x,
+                       self.eye_right.origin[1] + self.eye_right.pupil.y)
+
+        horizontal_left = self.eye_left.pupil.x / (self.eye_left.center[0] * 2 - 10)
+        horizontal_right = self.eye_right.pupil.x / (self.eye_right.center[0] * 2 - 10)
+        horizontal_ratio = (horizontal_left + horizontal_right) / 2
+
+        vertical_left = self.eye_left.pupil.y / (self.eye_left.center[1] * 2 - 10)
+        vertical_right = self.eye_right.pupil.y / (self.eye_right.center[1] * 2 - 10)
+        vertical_ratio = (vertical_left + vertical_right) / 2
+
+        blinking_ratio = (self.eye_left.blinking + self.eye_right.blinking) / 2
+
+        is_right = horizontal_ratio <= 0.35
+        is_left = horizontal_ratio >= 0.65
+
+        return GazeResult(
+            pupils_located=True,
+            left_pupil=left_pupil,
+            right_pupil=right_pupil,
+            horizontal_ratio=horizontal_ratio,
+            vertical_ratio=vertical_ratio,
+            is_blinking=blinking_ratio > 3.8,
+            is_right=is_right,
+            is_left=is_left,
+            is_center=not is_right and not is_left,
+        )
+
+    def _detect_face(self, frame):
+        """Finds the face to analyze, reusing the previous face box when
+        tracking is enabled and falling back to a full-frame detection.
+
+        Arguments:
+            frame (numpy.ndarray): Grayscale frame
+
+        Returns:
+            A dlib.rectangle, or None if no face was found
+        """
+        if (self.face_tracking and self._face_box is not None and
+                self._frames_since_detection < self.detection_interval):
+            face = self._detector.detect_near(frame, self._face_box, self.roi_margin)
+            if face is not None:
+                self._frames_since_detection += 1
+                return face
+
+        self._frames_since_detection = 0
+        faces = self._detector.detect(frame)
+        if len(faces) == 0:
+            return None
+        return faces[0]
+
+    def _lap(self, stage, start):
+        """Reports a finished analysis step to the timer, if there is one"""
+        if self.timer is None:
+            return 0
+        return self.timer.lap(stage, start)
+
+    def _analyze_face(self, frame, face):
+        """Predicts the landmarks of a face and initialize Eye objects
+
+        Arguments:
+            frame (numpy.ndarray): Grayscale frame
+            face (dlib.rectangle): Box of the face to analyze
+        """
+        start = self.timer.start() if self.timer else 0
+        landmarks = self._predictor(frame, face)
+        start = self._lap('gaze.landmarks', start)
+        self.eye_left = Eye(frame, landmarks, 0, self.calibration)
+        self.eye_right = Eye(frame, landmarks, 1, self.calibration)
+        self.result = self._compute_result()
+        self._lap('gaze.eyes_and_pupils', start)
+
     def _analyze(self):
         """Detects the face and initialize Eye objects"""
+        start = self.timer.start() if self.timer else 0
         frame = cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY)
-        faces = self._face_detector(frame)
-
-        try:
-            landmarks = self._predictor(frame, faces[0])
-            self.eye_left = Eye(frame, landmarks, 0, self.calibration)
-            self.eye_right = Eye(frame, landmarks, 1, self.calibration)
+        start = self._lap('gaze.grayscale', start)
+        face = self._detect_face(frame)
+        start = self._lap('gaze.face_detection', start)
 
-        except IndexError:
+        if face is None:
             self.eye_left = None
             self.eye_right = None
+            self.result = GazeResult()
+            self._face_box = None
+            return
+
+        self._analyze_face(frame, face)
+
+        # Losing the pupils means the landmarks are unreliable, so the next
+        # frame goes back to a full-frame detection
+        self._face_box = face if self.result.pupils_located else None
 
     def refresh(self, frame):
         """Refreshes the frame and analyzes it.
 
         Arguments:
             frame (numpy.ndarray): The frame to analyze
+
+        Returns:
+            The GazeResult computed for this frame
         """
         self.frame = frame
         self._analyze()
+        return self.result
+
+    def refresh_face(self, frame, face, gray=None):
+        """Analyzes a face that was detected elsewhere, skipping face detection.
+
+        Arguments:
+            frame (numpy.ndarray): The frame to analyze
+            face (dlib.rectangle): Box of the face in the frame
+            gray (numpy.ndarray): Grayscale version of the frame, if already computed
+
+        Returns:
+            The GazeResult computed for this face
+        """
+        self.frame = frame
+        if gray is None:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        self._analyze_face(gray, face)
+        return self.result
 
     def pupil_left_coords(self):
         """Returns the coordinates of the left pupil"""
-        if self.pupils_located:
-            x = self.eye_left.origin[0] + self.eye_left.pupil.x
-            y = self.eye_left.origin[1] + self.eye_left.pupil.y
-            return (x, y)
+        return self.result.left_pupil
 
     def pupil_right_coords(self):
         """Returns the coordinates of the right pupil"""
-        if self.pupils_located:
-            x = self.eye_right.origin[0] + self.eye_right.pupil.x
-            y = self.eye_right.origin[1] + self.eye_right.pupil.y
-            return (x, y)
+        return self.result.right_pupil
 
     def horizontal_ratio(self):
         """Returns a number between 0.0 and 1.0 that indicates the
         horizontal direction of the gaze. The extreme right is 0.0,
         the center is 0.5 and the extreme left is 1.0
         """
-        if self.pupils_located:
-            pupil_left = self.eye_left.pupil.x / (self.eye_left.center[0] * 2 - 10)
-            pupil_right = self.eye_right.pupil.x / (self.eye_right.center[0] * 2 - 10)
-            return (pupil_left + pupil_right) / 2
+        return self.result.horizontal_ratio
 
     def vertical_ratio(self):
         """Returns a number between 0.0 and 1.0 that indicates the
         vertical direction of the gaze. The extreme top is 0.0,
         the center is 0.5 and the extreme bottom is 1.0
         """
-        if self.pupils_located:
-            pupil_left = self.eye_left.pupil.y / (self.eye_left.center[1] * 2 - 10)
-            pupil_right = self.eye_right.pupil.y / (self.eye_right.center[1] * 2 - 10)
-            return (pupil_left + pupil_right) / 2
+        return self.result.vertical_ratio
 
     def is_right(self):
         """Returns true if the user is looking to the right"""
-        if self.pupils_located:
-            return self.horizontal_ratio() <= 0.35
+        return self.result.is_right
 
     def is_left(self):
         """Returns true if the user is looking to the left"""
-        if self.pupils_located:
-            return self.horizontal_ratio() >= 0.65
+        return self.result.is_left
 
     def is_center(self):
         """Returns true if the user is looking to the center"""
-        if self.pupils_located:
-            return self.is_right() is not True and self.is_left() is not True
+        return self.result.is_center
 
     def is_blinking(self):
         """Returns true if the user closes his eyes"""
-        if self.pupils_located:
-            blinking_ratio = (self.eye_left.blinking + self.eye_right.blinking) / 2
-            return blinking_ratio > 3.8
+        return self.result.is_blinking
 
-    def annotated_frame(self):
-        """Returns the main frame with pupils highlighted"""
-        frame = self.frame.copy()
+    @staticmethod
+    def draw_pupils(frame, result, color=(0, 255, 0)):
+        """Draws a crosshair on each pupil of the result, in place
 
-        if self.pupils_located:
-            color = (0, 255, 0)
-            x_left, y_left = self.pupil_left_coords()
-            x_right, y_right = self.pupil_right_coords()
+        Arguments:
+            frame (numpy.ndarray): The BGR image to draw on
+            result (GazeResult): Analysis of that frame
+            color (tuple): BGR color of the crosshairs
+        """
+        if result.pupils_located:
+            x_left, y_left = result.left_pupil
+            x_right, y_right = result.right_pupil
             cv2.line(frame, (x_left - 5, y_left), (x_left + 5, y_left), color)
             cv2.line(frame, (x_left, y_left - 5), (x_left, y_left + 5), color)
             cv2.line(frame, (x_right - 5, y_right), (x_right + 5, y_right), color)
             cv2.line(frame, (x_right, y_right - 5), (x_right, y_right + 5), color)
 
+    def annotated_frame(self):
+        """Returns a copy of the main frame with pupils highlighted.
+        Only built on request; draw_pupils() annotates an existing buffer instead.
+        """
+        frame = self.frame.copy()
+        self.draw_pupils(frame, self.result)
         return frame
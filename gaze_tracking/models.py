@@ -0,0 +1,124 @@
+from __future__ import division
+import os
+import threading
+import numpy as np
+import cv2
+import dlib
+
+
+DEFAULT_PREDICTOR_PATH = os.path.abspath(os.path.join(
+    os.path.dirname(__file__), "trained_models/shape_predictor_68_face_landmarks.dat"))
+
+_models = {}
+_lock = threading.Lock()
+
+
+def _get_model(key, loader):
+    """Returns the cached model for the key, loading it once per process.
+
+    Arguments:
+        key: Cache key of the model
+        loader: Function that loads the model
+    """
+    model = _models.get(key)
+    if model is None:
+        with _lock:
+            model = _models.get(key)
+            if model is None:
+                model = loader()
+                _models[key] = model
+    return model
+
+
+def get_face_detector():
+    """Returns the shared dlib frontal face detector"""
+    return _get_model('face_detector', dlib.get_frontal_face_detector)
+
+
+def get_shape_predictor(model_path=None):
+    """Returns the shared dlib shape predictor for the given model file.
+
+    Argument:
+        model_path (str): Path of the landmarks model, defaults to the 68-point model
+    """
+    model_path = os.path.abspath(model_path or DEFAULT_PREDICTOR_PATH)
+    return _get_model(('shape_predictor', model_path), lambda: dlib.shape_predictor(model_path))
+
+
+def preload(model_path=None):
+    """Loads the face detector and shape predictor into the cache"""
+    get_face_detector()
+    get_shape_predictor(model_path)
+
+
+class FaceDetector(object):
+    """
+    Runs the shared face detector on a downscaled image and maps the
+    detections back to full-resolution frame coordinates. Used by both
+    GazeTracking and MultiFaceTracking
+    """
+
+    def __init__(self, detection_scale=1.0):
+        """
+        Arguments:
+            detection_scale (float): Scale applied to the image before face
+                detection; landmarks and pupils still use the full resolution
+        """
+        self.detection_scale = detection_scale
+        self.face_detector = get_face_detector()
+
+    def detect(self, image, offset=(0, 0)):
+        """Returns the faces of the image.
+
+        Arguments:
+            image (numpy.ndarray): Grayscale image to search
+            offset (tuple): Position of the image inside the full frame
+
+        Returns:
+            A list of dlib.rectangle in frame coordinates
+        """
+        scale = self.detection_scale
+        if scale != 1.0:
+            image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+        faces = []
+        for face in self.face_detector(image):
+            faces.append(dlib.rectangle(int(round(face.left() / scale)) + offset[0],
+                                        int(round(face.top() / scale)) + offset[1],
+                                        int(round(face.right() / scale)) + offset[0],
+                                        int(round(face.bottom() / scale)) + offset[1]))
+        return faces
+
+    def detect_near(self, frame, box, margin=0.5):
+        """Searches for a face in the area around a previous face box.
+
+        Arguments:
+            frame (numpy.ndarray): Grayscale frame
+            box (dlib.rectangle): Face box found on a previous frame
+            margin (float): Margin added around the box, as a fraction of its size
+
+        Returns:
+            The face rectangle in frame coordinates, or None if not found
+        """
+        height, width = frame.shape[:2]
+        margin_x = int(box.width() * margin)
+        margin_y = int(box.height() * margin)
+        left = max(0, box.left() - margin_x)
+        top = max(0, box.top() - margin_y)
+        right = min(width, box.right() + margin_x)
+        bottom = min(height, box.bottom() + margin_y)
+
+        if right <= left or bottom <= top:
+            return None
+
+        roi = np.ascontiguousarray(frame[top:bottom, left:right])
+        faces = self.detect(roi, (left, top))
+        if len(faces) == 0:
+            return None
+        return faces[0]
+
+
+def clear():
+    """Drops every cached model"""
+    with _lock:
+        _models.clear()
@@ -0,0 +1,241 @@
+from __future__ import division
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+from .gaze_tracking import GazeTracking
+from .gaze_result import GazeResult
+from .calibration import Calibration
+from . import models
+
+
+class MultiFaceTracking(object):
+    """
+    This class tracks the gaze of every face in the frame.
+    Faces keep the same ID across frames by matching their boxes with
+    the previous ones, and each face has its own GazeTracking (eyes,
+    pupils and pupil thresholds). Faces are analyzed on a thread pool
+    """
+
+    def __init__(self, max_faces=None, max_workers=4, detection_scale=1.0, min_overlap=0.3,
+                 max_missed_frames=15, face_tracking=False, detection_interval=10, roi_margin=0.5,
+                 timer=None):
+        """
+        Arguments:
+            max_faces (int): Only the largest faces are analyzed, None for all
+            max_workers (int): Threads analyzing faces in parallel
+            detection_scale (float): Scale applied to the image before face detection
+            min_overlap (float): Minimum intersection over union for a box to
+                keep the ID of a face from the previous frames
+            max_missed_frames (int): Frames a face may be missing before its ID
+                and pupil thresholds are forgotten
+            face_tracking (bool): Search for the faces around their previous
+                positions instead of scanning the whole frame every time
+            detection_interval (int): Number of tracked frames before a full-frame
+                detection is forced again, which also finds faces that just appeared
+            roi_margin (float): Margin added around the previous face boxes, as a
+                fraction of their size
+            timer: Optional stage timer (with start() and lap(stage, start))
+        """
+        self.frame = None
+        self.results = {}
+        self.face_boxes = {}
+        self.result = GazeResult()
+
+        # Pupil thresholds of the primary face, normally the calibrated user.
+        # They are the ones saved between sessions, so they move to the new
+        # primary face when the face holding them is forgotten
+        self.calibration = Calibration()
+        self._calibrated_face = None
+
+        self.max_faces = max_faces
+        self.max_workers = max_workers
+        self.min_overlap = min_overlap
+        self.max_missed_frames = max_missed_frames
+        self.face_tracking = face_tracking
+        self.detection_interval = detection_interval
+        self.roi_margin = roi_margin
+        self.timer = timer
+        self._frames_since_detection = 0
+
+        self._detector = models.FaceDetector(detection_scale)
+        self._trackers = {}
+        self._boxes = {}
+        self._missed = {}
+        self._next_id = 0
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._closed = False
+
+    @property
+    def primary_face_id(self):
+        """ID of the face holding the saved pupil thresholds (normally the
+        calibrated user), or None when that face isn't in the current frame.
+        Other faces never stand in for it, so their gaze is never mapped
+        with the user's screen calibration
+        """
+        return self._calibrated_face if self._calibrated_face in self.results else None
+
+    @staticmethod
+    def _overlap(box, other):
+        """Returns the intersection over union of two dlib.rectangle"""
+        width = min(box.right(), other.right()) - max(box.left(), other.left())
+        height = min(box.bottom(), other.bottom()) - max(box.top(), other.top())
+        if width <= 0 or height <= 0:
+            return 0.0
+        intersection = width * height
+        union = MultiFaceTracking._area(box) + MultiFaceTracking._area(other) - intersection
+        return intersection / union
+
+    @staticmethod
+    def _area(box):
+        return (box.right() - box.left()) * (box.bottom() - box.top())
+
+    def _new_face(self):
+        """Starts tracking a new face and returns its ID"""
+        face_id = self._next_id
+        self._next_id += 1
+        self._trackers[face_id] = GazeTracking()
+        return face_id
+
+    def _hand_over_calibration(self, tracked):
+        """Gives the saved pupil thresholds to the oldest face of the frame
+        when the face holding them is no longer tracked at all
+
+        Arguments:
+            tracked (list): (face ID, box) of the current frame
+        """
+        if self._calibrated_face in self._trackers or not tracked:
+            return
+        self._calibrated_face = min(face_id for face_id, _ in tracked)
+        self._trackers[self._calibrated_face].calibration = self.calibration
+
+    def _detect_faces(self, gray):
+        """Finds the faces of the frame, around the previous face boxes when
+        tracking is enabled and falling back to a full-frame detection when
+        one of the faces is lost there or the detection interval is reached.
+
+        Arguments:
+            gray (numpy.ndarray): Grayscale frame
+
+        Returns:
+            A list of dlib.rectangle
+        """
+        if (self.face_tracking and self.results and
+                self._frames_since_detection < self.detection_interval and
+                all(result.pupils_located for result in self.results.values())):
+            faces = [self._detector.detect_near(gray, self.face_boxes[face_id], self.roi_margin)
+                     for face_id in self.results]
+            if all(face is not None for face in faces):
+                self._frames_since_detection += 1
+                return faces
+
+        self._frames_since_detection = 0
+        faces = self._detector.detect(gray)
+        if self.max_faces is not None:
+            faces = sorted(faces, key=self._area, reverse=True)[:self.max_faces]
+        return faces
+
+    def _associate(self, faces):
+        """Gives every detected box the ID of the known face it overlaps the
+        most, pairing the largest overlaps first; other boxes get a new ID.
+
+        Arguments:
+            faces (list): Detected dlib.rectangle of the current frame
+
+        Returns:
+            A list of (face ID, box)
+        """
+        pairs = sorted(((self._overlap(box, self._boxes[face_id]), face_id, index)
+                        for face_id in self._boxes for index, box in enumerate(faces)), reverse=True)
+        matched = {}
+        for overlap, face_id, index in pairs:
+            if overlap < self.min_overlap:
+                break
+            if index not in matched and face_id not in matched.values():
+                matched[index] = face_id
+
+        tracked = []
+        for index, box in enumerate(faces):
+            face_id = matched[index] if index in matched else self._new_face()
+            self._boxes[face_id] = box
+            self._missed[face_id] = 0
+            tracked.append((face_id, box))
+
+        seen = set(face_id for face_id, _ in tracked)
+        for face_id in list(self._boxes):
+            if face_id in seen:
+                continue
+            self._missed[face_id] += 1
+            if self._missed[face_id] > self.max_missed_frames:
+                del self._boxes[face_id], self._missed[face_id], self._trackers[face_id]
+        return tracked
+
+    def _lap(self, stage, start):
+        """Reports a finished analysis step to the timer, if there is one"""
+        if self.timer is None:
+            return 0
+        return self.timer.lap(stage, start)
+
+    def refresh(self, frame):
+        """Detects and analyzes every face of the frame.
+
+        Arguments:
+            frame (numpy.ndarray): The frame to analyze
+
+        Returns:
+            A dict of face ID -> GazeResult for the faces in this frame
+        """
+        self.frame = frame
+        start = self.timer.start() if self.timer else 0
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        tracked = self._associate(self._detect_faces(gray))
+        self._hand_over_calibration(tracked)
+        start = self._lap('gaze.face_detection', start)
+
+        def analyze(item):
+            face_id, box = item
+            return self._trackers[face_id].refresh_face(frame, box, gray)
+
+        # Landmarks and pupils of each face are independent; OpenCV and dlib
+        # release the GIL, so extra faces run alongside each other. Faces are
+        # submitted under the lock so close() can't shut the pool in between
+        futures = None
+        if len(tracked) > 1 and self.max_workers > 1:
+            with self._executor_lock:
+                if not self._closed:
+                    if self._executor is None:
+                        self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+                    futures = [self._executor.submit(analyze, item) for item in tracked]
+        if futures is not None:
+            results = [future.result() for future in futures]
+        else:
+            results = [analyze(item) for item in tracked]
+        self._lap('gaze.faces', start)
+
+        self.results = dict((face_id, result) for (face_id, _), result in zip(tracked, results))
+        self.face_boxes = dict(tracked)
+        primary = self.primary_face_id
+        self.result = self.results[primary] if primary is not None else GazeResult()
+        return self.results
+
+    def annotated_frame(self):
+        """Returns a copy of the main frame with the pupils of every face highlighted"""
+        frame = self.frame.copy()
+        for result in self.results.values():
+            GazeTracking.draw_pupils(frame, result)
+        return frame
+
+    def open(self):
+        """Allows the worker threads again after close()"""
+        with self._executor_lock:
+            self._closed = False
+
+    def close(self):
+        """Stops the worker threads. Faces analyzed until open() is called
+        again run on the calling thread, so no thread pool is left behind
+        """
+        with self._executor_lock:
+            self._closed = True
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
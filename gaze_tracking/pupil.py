@@ -16,6 +16,22 @@ class Pupil(object):
 
         self.detect_iris(eye_frame)
 
+    @staticmethod
+    def filter_frame(eye_frame):
+        """Smooths and erodes the eye frame before binarization
+
+        Arguments:
+            eye_frame (numpy.ndarray): Frame containing an eye and nothing else
+
+        Returns:
+            The filtered grayscale frame
+        """
+        kernel = np.ones((3, 3), np.uint8)
+        new_frame = cv2.bilateralFilter(eye_frame, 10, 15, 15)
+        new_frame = cv2.erode(new_frame, kernel, iterations=3)
+
+        return new_frame
+
     @staticmethod
     def image_processing(eye_frame, threshold):
         """Performs operations on the eye frame to isolate the iris
@@ -27,9 +43,7 @@ class Pupil(object):
         Returns:
             A frame with a single element representing the iris
         """
-        kernel = np.ones((3, 3), np.uint8)
-        new_frame = cv2.bilateralFilter(eye_frame, 10, 15, 15)
-        new_frame = cv2.erode(new_frame, kernel, iterations=3)
+        new_frame = Pupil.filter_frame(eye_frame)
         new_frame = cv2.threshold(new_frame, threshold, 255, cv2.THRESH_BINARY)[1]
 
         return new_frame
@@ -0,0 +1,207 @@
+import json
+import time
+import signal
+import argparse
+import itertools
+from pathlib import Path
+from data_acquisition import DataAcquisition
+from calibration import CalibrationModule
+from data_processing import DataProcessing, MultiSubjectProcessing, analyze_frame
+from session_log import SessionLogWriter
+from timing import StageTimer
+
+
+class HeadlessTracker:
+    # Acquisition -> gaze mapping -> DataProcessing only: no Tk, no windows,
+    # no annotated frames, frames are analyzed as fast as the source allows
+    def __init__(self, screen_width=1920, screen_height=1080, frame_source=None, output_dir='results',
+                 user_id='default', gaze_model='idw', profile=False, log_frames=True, multi_face=False,
+                 max_stored_samples=None):
+        self.timer = StageTimer(enabled=profile)
+        self.data_acquisition = DataAcquisition(frame_source=frame_source, timer=self.timer, multi_face=multi_face)
+        self.calibration = CalibrationModule(screen_width, screen_height, gaze_model)
+        self.data_processing = DataProcessing(screen_width, screen_height, max_stored_samples)
+        self.subject_processing = (MultiSubjectProcessing(screen_width, screen_height, max_stored_samples)
+                                   if multi_face else None)
+
+        self.output_dir = Path(output_dir)
+        self.user_id = user_id
+        self.log_frames = log_frames  # Also write the per-frame feature log
+        self.is_running = False
+        self.stop_reason = None
+
+    def stop(self, reason='stopped'):
+        # Safe to call from signal handlers and other threads
+        if self.stop_reason is None:
+            self.stop_reason = reason
+        self.is_running = False
+        self.data_acquisition.is_running = False  # Wakes a pending get_frame_data
+
+    def install_signal_handlers(self):
+        def handle(signum, frame):
+            self.stop(signal.Signals(signum).name)
+
+        signal.signal(signal.SIGINT, handle)
+        signal.signal(signal.SIGTERM, handle)
+
+    def _reserve_stamp(self):
+        # Creating the results file exclusively claims its stamp, so runs
+        # started in the same second (even in parallel) get _2, _3, ...
+        base = time.strftime("%Y%m%d_%H%M%S")
+        for n in itertools.count(1):
+            stamp = base if n == 1 else f"{base}_{n}"
+            try:
+                (self.output_dir / f"results_{stamp}.json").open('x').close()
+            except FileExistsError:
+                continue
+            return stamp
+
+    def run(self, duration=None, max_frames=None):
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        stamp = self._reserve_stamp()
+        try:
+            return self._run(stamp, duration, max_frames)
+        except BaseException:
+            # A run that failed early (e.g. the source couldn't be opened)
+            # leaves no empty results or frame log behind
+            for path in (self.output_dir / f"results_{stamp}.json", self.output_dir / f"session_{stamp}.frames"):
+                if path.exists() and path.stat().st_size == 0:
+                    path.unlink()
+            raise
+
+    def _run(self, stamp, duration, max_frames):
+        # Reuse the screen calibration and pupil thresholds of earlier GUI sessions
+        self.calibration.load_calibration()
+        pupil_calibration = self.data_acquisition.get_gaze_tracker().calibration
+        source_id = self.data_acquisition.get_source_id()
+        self.calibration.load_pupil_thresholds(pupil_calibration, source_id, self.user_id)
+
+        session_log = None
+        if self.log_frames:
+            session_log = SessionLogWriter(self.output_dir / f"session_{stamp}.frames")
+            session_log.start()
+
+        self.timer.reset()
+        self.stop_reason = None
+        self.is_running = True
+        frames_analyzed = 0
+        last_timestamp = None
+        started = time.perf_counter()
+
+        try:
+            self.data_acquisition.initialize_camera()
+            self.data_acquisition.start_acquisition()
+
+            # Session time follows the frame timestamps, so recorded sources
+            # analyzed faster than realtime still report their real duration
+            self.data_processing.reset_session(start_time=self.data_acquisition.source.start_time)
+            if self.subject_processing:
+                self.subject_processing.reset_session()
+            deadline = started + duration if duration else None
+
+            while self.is_running:
+                frame_data = self.data_acquisition.get_frame_data()
+                if frame_data is None:
+                    self.stop('source_ended')
+                    break
+
+                start = self.timer.start()
+                gaze_position = analyze_frame(self.calibration, self.data_processing, frame_data)
+                if self.subject_processing:
+                    self.subject_processing.process_faces(frame_data['faces'],
+                                                          {frame_data['primary_face_id']: gaze_position})
+                if session_log:
+                    session_log.log_frame(frame_data, gaze_position)
+                self.timer.lap('loop.processing', start)
+                self.timer.tick()
+
+                frames_analyzed += 1
+                last_timestamp = frame_data['timestamp']
+                if max_frames and frames_analyzed >= max_frames:
+                    self.stop('max_frames')
+                elif deadline and time.perf_counter() >= deadline:
+                    self.stop('duration')
+        finally:
+            elapsed = time.perf_counter() - started
+            self.is_running = False
+            self.data_acquisition.stop_acquisition()
+            if self.data_acquisition.has_gaze_tracker():
+                self.calibration.save_pupil_thresholds(pupil_calibration, source_id, self.user_id)
+            if session_log:
+                session_log.close()
+
+        self.data_processing.end_session(last_timestamp)
+        if self.subject_processing:
+            self.subject_processing.end_session(last_timestamp)
+        report = {
+            'source': source_id,
+            'stop_reason': self.stop_reason,
+            'calibrated': self.calibration.is_calibrated,
+            'frames_analyzed': frames_analyzed,
+            'elapsed_seconds': elapsed,
+            'analysis_fps': frames_analyzed / elapsed if elapsed > 0 else 0.0,
+            'capture': self.data_acquisition.get_capture_stats(),
+            'frame_log': str(session_log.path) if session_log else None,
+            'analysis': self.data_processing.get_comprehensive_analysis(),
+        }
+        if self.subject_processing:
+            report['subjects'] = self.subject_processing.get_analyses()
+
+        results_path = self.output_dir / f"results_{stamp}.json"
+        with open(results_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        report['results_path'] = str(results_path)
+
+        if self.timer.enabled:
+            self.timer.dump(self.output_dir / f"timings_{stamp}.json")
+        return report
+
+
+def _sample_cap(value):
+    cap = int(value)
+    if cap <= 0:
+        raise argparse.ArgumentTypeError(f"must be a positive number of samples, got {value}")
+    return cap
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the eye tracker without any GUI and write results to files")
+    parser.add_argument('--camera', type=int, default=0, help="Webcam index, used when no video or images are given")
+    parser.add_argument('--video', default=None, help="Use a recorded video instead of the webcam")
+    parser.add_argument('--images', default=None, help="Use a directory of images instead of the webcam")
+    parser.add_argument('--realtime', action='store_true', help="Play recorded frames at their original rate")
+    parser.add_argument('--duration', type=float, default=None, help="Stop after this many seconds")
+    parser.add_argument('--max-frames', type=int, default=None, help="Stop after analyzing this many frames")
+    parser.add_argument('--output-dir', default='results', help="Directory for results, frame logs and timings")
+    parser.add_argument('--user', default='default', help="User id for the remembered pupil thresholds")
+    parser.add_argument('--gaze-model', choices=['idw', 'regression'], default='idw')
+    parser.add_argument('--multi-face', action='store_true', help="Track every face and report each one")
+    parser.add_argument('--no-frame-log', action='store_true', help="Don't write the per-frame feature log")
+    parser.add_argument('--max-stored-samples', type=_sample_cap, default=None,
+                        help="Keep only the newest N gaze samples in memory, for long unattended runs")
+    parser.add_argument('--profile', action='store_true', help="Also save per-stage timings")
+    args = parser.parse_args()
+
+    from frame_sources import WebcamSource, VideoFileSource, ImageSequenceSource
+    if args.video:
+        frame_source = VideoFileSource(args.video, realtime=args.realtime)
+    elif args.images:
+        frame_source = ImageSequenceSource(args.images, realtime=args.realtime)
+    else:
+        frame_source = WebcamSource(args.camera)
+
+    tracker = HeadlessTracker(frame_source=frame_source, output_dir=args.output_dir, user_id=args.user,
+                              gaze_model=args.gaze_model, profile=args.profile,
+                              log_frames=not args.no_frame_log, multi_face=args.multi_face,
+                              max_stored_samples=args.max_stored_samples)
+    tracker.install_signal_handlers()
+    report = tracker.run(duration=args.duration, max_frames=args.max_frames)
+
+    print(f"Stopped: {report['stop_reason']} after {report['frames_analyzed']} frames "
+          f"({report['analysis_fps']:.1f} fps)")
+    print(f"Assessment: {report['analysis']['assessment']}")
+    print(f"Results saved to {report['results_path']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,78 @@
-import cv2
+import time
+import json
+import queue
+import argparse
+import threading
 import tkinter as tk
-from data_acquisition import DataAcquisition
+from pathlib import Path
+from data_acquisition import DataAcquisition, preload_tracking_models
 from calibration import CalibrationModule
-from data_processing import DataProcessing
+from data_processing import DataProcessing, MultiSubjectProcessing, analyze_frame
 from visualization_ui import VisualizationUI
+from session_log import SessionLogWriter
+from timing import StageTimer
+
+
+def _put_latest(q, item):
+    # Bounded queue that keeps the newest item; only one thread puts
+    try:
+        q.put_nowait(item)
+    except queue.Full:
+        try:
+            q.get_nowait()
+        except queue.Empty:
+            pass
+        q.put_nowait(item)
 
 
 class SocialAnxietyTracker:
-    def __init__(self, screen_width=1920, screen_height=1080):
+    def __init__(self, screen_width=1920, screen_height=1080, frame_source=None, log_dir='sessions',
+                 user_id='default', gaze_model='idw', profile=False, preload_models=True,
+                 metrics_rate=4.0, display_rate=60.0, multi_face=False, max_stored_samples=None):
+        # Start loading the face models while the user reads the first dialog
+        if preload_models:
+            preload_tracking_models()
+        
+        # Per-stage timings, only collected when profiling
+        self.timer = StageTimer(enabled=profile)
+        
         # Initialize all modules
-        self.data_acquisition = DataAcquisition()
-        self.calibration = CalibrationModule(screen_width, screen_height)
-        self.data_processing = DataProcessing(screen_width, screen_height)
+        self.data_acquisition = DataAcquisition(frame_source=frame_source, timer=self.timer, multi_face=multi_face)
+        self.calibration = CalibrationModule(screen_width, screen_height, gaze_model)
+        # max_stored_samples caps the kept gaze samples, so memory stays flat on long runs
+        self.data_processing = DataProcessing(screen_width, screen_height, max_stored_samples)
+        
+        # With multi_face, every tracked face also gets its own analysis;
+        # data_processing keeps following the primary (calibrated) face
+        self.subject_processing = (MultiSubjectProcessing(screen_width, screen_height, max_stored_samples)
+                                   if multi_face else None)
         self.ui = VisualizationUI(screen_width, screen_height)
         
         # System state
         self.is_monitoring = False
+        self.metrics_rate = metrics_rate  # Metrics snapshots per second, 0 for every frame
+        self.display_rate = display_rate  # Max displayed frames per second, 0 disables the window
+        self.analysis_thread = None
+        self.log_dir = log_dir  # Per-frame feature logs, None disables logging
+        self.session_log = None
+        self.user_id = user_id
+        self.pupil_thresholds_loaded = False
+    
+    def _pupil_calibration(self):
+        return self.data_acquisition.get_gaze_tracker().calibration
+    
+    def _prepare_tracking(self):
+        # Loads the tracker (dlib models) on first use and reuses pupil
+        # thresholds learned in earlier runs
+        if not self.pupil_thresholds_loaded:
+            self.calibration.load_pupil_thresholds(self._pupil_calibration(),
+                                                   self.data_acquisition.get_source_id(), self.user_id)
+            self.pupil_thresholds_loaded = True
+    
+    def _save_pupil_thresholds(self):
+        if self.data_acquisition.has_gaze_tracker():
+            self.calibration.save_pupil_thresholds(self._pupil_calibration(),
+                                                   self.data_acquisition.get_source_id(), self.user_id)
         
     def run_calibration_process(self):
         print("Starting calibration...")
@@ -30,6 +87,7 @@ class SocialAnxietyTracker:
         
         # Initialize camera for calibration
         try:
+            self._prepare_tracking()
             self.data_acquisition.initialize_camera()
             self.data_acquisition.start_acquisition()
             
@@ -52,6 +110,7 @@ class SocialAnxietyTracker:
             return False
         finally:
             self.data_acquisition.stop_acquisition()
+            self._save_pupil_thresholds()
     
     def start_monitoring_session(self):
         # Start monitoring session
@@ -60,16 +119,75 @@ class SocialAnxietyTracker:
         
         # Reset data processing for new session
         self.data_processing.reset_session()
+        if self.subject_processing:
+            self.subject_processing.reset_session()
+        self.timer.reset()
+        
+        if self.log_dir:
+            log_path = Path(self.log_dir) / time.strftime("session_%Y%m%d_%H%M%S.frames")
+            self.session_log = SessionLogWriter(log_path)
+            self.session_log.start()
         
         try:
             # Initialize camera
+            self._prepare_tracking()
             self.data_acquisition.initialize_camera()
             self.data_acquisition.start_acquisition()
             self.is_monitoring = True
             
+            # Analysis runs at camera rate on its own thread, the display
+            # only ever sees the newest frame and metrics
+            self.display_queue = queue.Queue(maxsize=1)
+            self.metrics_queue = queue.Queue(maxsize=1)
+            self.analysis_error = None
+            self.analysis_thread = threading.Thread(target=self._analysis_loop, daemon=True)
+            self.analysis_thread.start()
+            
             print("Starting monitoring...")
-            print("Press ESC to stop")
+            if self.display_rate:
+                print("Press ESC to stop")
+                self._display_loop()
+            else:
+                print("Press Ctrl+C to stop")
+                while self.analysis_thread.is_alive():
+                    self.analysis_thread.join(timeout=0.2)
             
+            if self.analysis_error:
+                raise self.analysis_error
+                    
+        except KeyboardInterrupt:
+            print("\nStopped by user")
+        except Exception as e:
+            print(f"Error: {e}")
+            self.ui.show_error_message("Error", 
+                                     f"Something went wrong: {str(e)}")
+        finally:
+            # The analysis thread must be done with the tracker before
+            # acquisition shuts it down
+            self.is_monitoring = False
+            self.data_acquisition.is_running = False  # Wakes a pending get_frame_data
+            if self.analysis_thread:
+                self.analysis_thread.join()
+                self.analysis_thread = None
+            self.data_acquisition.cleanup()
+            self._save_pupil_thresholds()
+            stats = self.data_acquisition.get_capture_stats()
+            print(f"Frames: {stats['frames_captured']} captured, "
+                  f"{stats['frames_processed']} analyzed, {stats['frames_dropped']} dropped")
+            if self.session_log:
+                self.session_log.close()
+                print(f"Saved frame log to '{self.session_log.path}'")
+                self.session_log = None
+            if self.timer.enabled:
+                self._save_timings()
+            if self.subject_processing:
+                self._save_subject_results()
+            self._show_session_results()
+    
+    def _analysis_loop(self):
+        next_metrics = 0.0
+        
+        try:
             while self.is_monitoring:
                 # Get frame data from acquisition module
                 frame_data = self.data_acquisition.get_frame_data()
@@ -77,43 +195,84 @@ class SocialAnxietyTracker:
                 if frame_data is None:
                     break
                 
-                # Get gaze position from calibration module (if calibrated)
-                gaze_position = None
-                if self.calibration.is_calibrated and frame_data['pupils_located']:
-                    left_pupil = frame_data['left_pupil']
-                    right_pupil = frame_data['right_pupil']
-                    gaze_tracker = self.data_acquisition.get_gaze_tracker()
-                    gaze_position = self.calibration.predict_gaze_position(
-                        left_pupil, right_pupil, gaze_tracker
-                    )
+                start = self.timer.start()
                 
-                # Process frame
-                self.data_processing.process_frame(frame_data, gaze_position)
+                # Map the gaze to the screen and process the frame
+                gaze_position = analyze_frame(self.calibration, self.data_processing, frame_data)
+                if self.subject_processing:
+                    # Screen calibration only applies to the primary face
+                    gaze_positions = {frame_data['primary_face_id']: gaze_position}
+                    self.subject_processing.process_faces(frame_data['faces'], gaze_positions)
+                if self.session_log:
+                    self.session_log.log_frame(frame_data, gaze_position)
+                start = self.timer.lap('loop.processing', start)
                 
-                # Get current analysis for display
-                current_analysis = self.data_processing.get_comprehensive_analysis()
-                current_analysis['pupils_located'] = frame_data['pupils_located']
+                # Metrics snapshot at its own, slower cadence
+                now = time.perf_counter()
+                if now >= next_metrics:
+                    next_metrics = now + 1.0 / self.metrics_rate if self.metrics_rate > 0 else now
+                    current_analysis = self.data_processing.get_comprehensive_analysis()
+                    timings = self.timer.snapshot() if self.timer.enabled else None
+                    _put_latest(self.metrics_queue, (current_analysis, timings))
+                    self.timer.lap('loop.analysis', start)
                 
-                display_frame = self.ui.create_monitoring_display(
-                    frame_data['annotated_frame'], gaze_position, current_analysis
-                )
-                
-                # Show monitoring display
-                cv2.imshow("Eye Tracker", display_frame)
-                
-                # Check for exit
-                if cv2.waitKey(1) == 27:  # ESC key
-                    self.is_monitoring = False
-                    
-        except KeyboardInterrupt:
-            print("\nStopped by user")
+                if self.display_rate:
+                    _put_latest(self.display_queue, (frame_data, gaze_position))
+                self.timer.tick()
         except Exception as e:
-            print(f"Error: {e}")
-            self.ui.show_error_message("Error", 
-                                     f"Something went wrong: {str(e)}")
+            self.analysis_error = e
         finally:
-            self.data_acquisition.cleanup()
-            self._show_session_results()
+            self.is_monitoring = False
+    
+    def _display_loop(self):
+        import cv2
+        
+        current_analysis, timings = {}, None
+        frame_interval = 1.0 / self.display_rate
+        next_display = 0.0
+        
+        while self.is_monitoring or not self.display_queue.empty():
+            try:
+                frame_data, gaze_position = self.display_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            
+            start = self.timer.start()
+            try:
+                current_analysis, timings = self.metrics_queue.get_nowait()
+            except queue.Empty:
+                pass
+            
+            overlay_analysis = dict(current_analysis, pupils_located=frame_data['pupils_located'])
+            display_frame = self.ui.create_monitoring_display(
+                frame_data['frame'], gaze_position, overlay_analysis, timings, frame_data['gaze_result']
+            )
+            start = self.timer.lap('loop.render', start)
+            
+            # Show monitoring display
+            cv2.imshow("Eye Tracker", display_frame)
+            
+            # Check for exit, waiting out the rest of the display interval
+            wait_ms = max(1, int((next_display - time.perf_counter()) * 1000))
+            if cv2.waitKey(wait_ms) == 27:  # ESC key
+                self.is_monitoring = False
+            next_display = time.perf_counter() + frame_interval
+            self.timer.lap('loop.display', start)
+    
+    def _save_timings(self):
+        timings_dir = Path(self.log_dir or '.')
+        timings_dir.mkdir(parents=True, exist_ok=True)
+        timings_path = timings_dir / time.strftime("timings_%Y%m%d_%H%M%S.json")
+        self.timer.dump(timings_path)
+        print(f"Saved stage timings to '{timings_path}'")
+    
+    def _save_subject_results(self):
+        results_dir = Path(self.log_dir or '.')
+        results_dir.mkdir(parents=True, exist_ok=True)
+        results_path = results_dir / time.strftime("subjects_%Y%m%d_%H%M%S.json")
+        with open(results_path, 'w') as f:
+            json.dump(self.subject_processing.get_analyses(), f, indent=2)
+        print(f"Saved analyses of {len(self.subject_processing.subjects)} faces to '{results_path}'")
     
     def _show_session_results(self):
         analysis_results = self.data_processing.get_comprehensive_analysis()
@@ -156,8 +315,52 @@ class SocialAnxietyTracker:
             root.destroy()
 
 
+def _rate(value):
+    rate = float(value)
+    if rate < 0:
+        raise argparse.ArgumentTypeError(f"must be 0 or more, got {value}")
+    return rate
+
+
+def _sample_cap(value):
+    cap = int(value)
+    if cap <= 0:
+        raise argparse.ArgumentTypeError(f"must be a positive number of samples, got {value}")
+    return cap
+
+
 def main():
-    app = SocialAnxietyTracker()
+    parser = argparse.ArgumentParser(description="Eye Tracker for Social Anxiety Tracking")
+    parser.add_argument('--video', default=None, help="Use a recorded video instead of the webcam")
+    parser.add_argument('--images', default=None, help="Use a directory of images instead of the webcam")
+    parser.add_argument('--realtime', action='store_true', help="Play recorded frames at their original rate")
+    parser.add_argument('--gaze-model', choices=['idw', 'regression'], default='idw',
+                        help="Map pupils to the screen by nearest calibration points or by a fitted polynomial")
+    parser.add_argument('--user', default='default', help="User id for the remembered pupil thresholds")
+    parser.add_argument('--profile', action='store_true',
+                        help="Time each processing stage, show FPS on screen and save the timings")
+    parser.add_argument('--multi-face', action='store_true',
+                        help="Track every face in view and save an analysis per face")
+    parser.add_argument('--metrics-rate', type=_rate, default=4.0,
+                        help="How many times per second the on-screen metrics are recomputed, 0 for every frame")
+    parser.add_argument('--display-rate', type=_rate, default=60.0,
+                        help="Max frames per second shown on screen, 0 tracks without a window")
+    parser.add_argument('--max-stored-samples', type=_sample_cap, default=None,
+                        help="Keep only the newest N gaze samples in memory, for long unattended runs")
+    args = parser.parse_args()
+    
+    frame_source = None
+    if args.video or args.images:
+        from frame_sources import VideoFileSource, ImageSequenceSource
+    if args.video:
+        frame_source = VideoFileSource(args.video, realtime=args.realtime)
+    elif args.images:
+        frame_source = ImageSequenceSource(args.images, realtime=args.realtime)
+    
+    app = SocialAnxietyTracker(frame_source=frame_source, user_id=args.user, gaze_model=args.gaze_model,
+                               profile=args.profile, metrics_rate=args.metrics_rate,
+                               display_rate=args.display_rate, multi_face=args.multi_face,
+                               max_stored_samples=args.max_stored_samples)
     app.run_complete_session()
 
 
@@ -0,0 +1,135 @@
+import os
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+from gaze_tracking import GazeTracking
+from data_acquisition import frame_data_from_result
+from calibration import CalibrationModule
+from data_processing import DataProcessing, analyze_frame
+
+
+# One tracker per worker process, so the dlib models load once per worker
+_worker_tracker = None
+
+
+def _warm_up_tracker(tracker, video_path, max_frames=300):
+    # Every worker learns the pupil thresholds from the same opening frames,
+    # so all chunks are analyzed with identical thresholds
+    capture = cv2.VideoCapture(video_path)
+    frames_read = 0
+    while not tracker.calibration.is_complete() and frames_read < max_frames:
+        ret, frame = capture.read()
+        if not ret:
+            break
+        tracker.refresh(frame)
+        frames_read += 1
+    capture.release()
+
+
+def _init_worker(video_path, detection_scale):
+    global _worker_tracker
+    _worker_tracker = GazeTracking(detection_scale=detection_scale)
+    _warm_up_tracker(_worker_tracker, video_path)
+
+
+def _analyze_chunk(video_path, start_frame, end_frame, fps):
+    capture = cv2.VideoCapture(video_path)
+    capture.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+
+    results = []
+    for frame_index in range(start_frame, end_frame):
+        ret, frame = capture.read()
+        if not ret:
+            break
+        result = _worker_tracker.refresh(frame)
+        results.append((frame_index, frame_index / fps, result))
+
+    capture.release()
+    return results
+
+
+def get_video_info(video_path):
+    capture = cv2.VideoCapture(video_path)
+    if not capture.isOpened():
+        raise RuntimeError(f"Could not open video {video_path}")
+
+    frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    capture.release()
+    return frame_count, fps
+
+
+def analyze_video_frames(video_path, workers=None, chunk_size=300, detection_scale=1.0):
+    frame_count, fps = get_video_info(video_path)
+    workers = workers or os.cpu_count() or 1
+
+    chunks = [(start, min(start + chunk_size, frame_count))
+              for start in range(0, frame_count, chunk_size)]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(video_path, detection_scale)) as executor:
+        futures = [executor.submit(_analyze_chunk, video_path, start, end, fps)
+                   for start, end in chunks]
+        chunk_results = [future.result() for future in futures]
+
+    # Reassemble in frame order
+    frame_results = [entry for chunk in chunk_results for entry in chunk]
+    frame_results.sort(key=lambda entry: entry[0])
+    return frame_results
+
+
+def score_frame_results(frame_results, calibration=None, screen_width=1920, screen_height=1080):
+    processing = DataProcessing(screen_width, screen_height)
+    if not frame_results:
+        return processing
+
+    processing.reset_session(start_time=frame_results[0][1])
+
+    for _, timestamp, result in frame_results:
+        analyze_frame(calibration, processing, frame_data_from_result(result, timestamp))
+
+    processing.end_session(frame_results[-1][1])
+    return processing
+
+
+def analyze_video(video_path, workers=None, chunk_size=300, detection_scale=1.0,
+                  use_calibration=True, screen_width=1920, screen_height=1080):
+    frame_results = analyze_video_frames(video_path, workers, chunk_size, detection_scale)
+
+    calibration = None
+    if use_calibration:
+        calibration = CalibrationModule(screen_width, screen_height)
+        if not calibration.load_calibration():
+            calibration = None
+
+    processing = score_frame_results(frame_results, calibration, screen_width, screen_height)
+    return processing.get_comprehensive_analysis()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a recorded session video offline")
+    parser.add_argument('video', help="Path to the recorded video")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--chunk-size', type=int, default=300, help="Frames per work item")
+    parser.add_argument('--detection-scale', type=float, default=1.0)
+    parser.add_argument('--no-calibration', action='store_true', help="Ignore calibration_data.json")
+    parser.add_argument('--output', default=None, help="Write the analysis to this JSON file")
+    args = parser.parse_args()
+
+    analysis = analyze_video(args.video, args.workers, args.chunk_size, args.detection_scale,
+                             use_calibration=not args.no_calibration)
+
+    print(f"Assessment: {analysis['assessment']}")
+    print(f"Anxiety Score: {analysis['anxiety_score']}/{analysis['max_score']}")
+    print(f"Duration: {analysis['session_duration']:.1f} minutes")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(analysis, f, indent=2)
+        print(f"Analysis saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import time
+import queue
+import threading
+import numpy as np
+from pathlib import Path
+from data_processing import DataProcessing
+
+
+# One fixed-size record per analyzed frame, missing values are NaN
+FRAME_RECORD_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('pupils_located', 'u1'),
+    ('is_blinking', 'u1'),
+    ('left_x', '<f4'),
+    ('left_y', '<f4'),
+    ('right_x', '<f4'),
+    ('right_y', '<f4'),
+    ('horizontal_ratio', '<f4'),
+    ('vertical_ratio', '<f4'),
+    ('gaze_x', '<f4'),
+    ('gaze_y', '<f4'),
+])
+
+
+def frame_record(frame_data, gaze_position=None):
+    nan = float('nan')
+    left = frame_data['left_pupil'] or (nan, nan)
+    right = frame_data['right_pupil'] or (nan, nan)
+    gaze = gaze_position or (nan, nan)
+    h_ratio = frame_data['horizontal_ratio']
+    v_ratio = frame_data['vertical_ratio']
+
+    return (
+        frame_data['timestamp'],
+        bool(frame_data['pupils_located']),
+        bool(frame_data['is_blinking']),
+        left[0], left[1], right[0], right[1],
+        nan if h_ratio is None else h_ratio,
+        nan if v_ratio is None else v_ratio,
+        gaze[0], gaze[1],
+    )
+
+
+class SessionLogWriter:
+    def __init__(self, path, chunk_rows=1024, max_pending=100000, flush_interval=1.0):
+        self.path = Path(path)
+        self.chunk_rows = chunk_rows
+        self.flush_interval = flush_interval
+        self.rows_written = 0
+        self.rows_dropped = 0
+
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+
+    def start(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_bytes(b'')
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+
+    def log_frame(self, frame_data, gaze_position=None):
+        # Never blocks the capture loop; rows are dropped if the writer falls far behind
+        try:
+            self._queue.put_nowait(frame_record(frame_data, gaze_position))
+        except queue.Full:
+            self.rows_dropped += 1
+
+    def _write_loop(self):
+        pending = []
+        running = True
+        last_flush = time.monotonic()
+
+        while running:
+            timeout = max(0.0, last_flush + self.flush_interval - time.monotonic())
+            try:
+                row = self._queue.get(timeout=timeout)
+                if row is None:
+                    running = False
+                else:
+                    pending.append(row)
+            except queue.Empty:
+                pass
+
+            # Flush full chunks, or whatever is pending once the interval is up or when closing
+            now = time.monotonic()
+            if pending and (len(pending) >= self.chunk_rows or not running or
+                            now - last_flush >= self.flush_interval):
+                self._flush(pending)
+                pending = []
+            if not pending:
+                last_flush = now
+
+    def _flush(self, rows):
+        records = np.array(rows, dtype=FRAME_RECORD_DTYPE)
+        with open(self.path, 'ab') as f:
+            records.tofile(f)
+        self.rows_written += len(records)
+
+    def close(self, timeout=5.0):
+        if self._thread is None:
+            return
+        # The queue may be full; wait for room, then drop rows rather than hang
+        while True:
+            try:
+                self._queue.put(None, timeout=timeout)
+                break
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.rows_dropped += 1
+                except queue.Empty:
+                    pass
+        self._thread.join()
+        self._thread = None
+
+
+def load_session_log(path):
+    # Memory-mapped view of every record in the log
+    path = Path(path)
+    if path.stat().st_size == 0:
+        return np.zeros(0, dtype=FRAME_RECORD_DTYPE)
+    return np.memmap(path, dtype=FRAME_RECORD_DTYPE, mode='r')
+
+
+def analyze_session_log(path, screen_width=1920, screen_height=1080):
+    records = load_session_log(path)
+    processing = DataProcessing(screen_width, screen_height)
+    gaze_xy = np.column_stack([records['gaze_x'], records['gaze_y']])
+    return processing.process_session(records['timestamp'], records['is_blinking'], gaze_xy)
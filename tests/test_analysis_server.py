@@ -0,0 +1,83 @@
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from analysis_server import StreamAnalysis, StreamScheduler
+
+
+def feature_row(timestamp, **fields):
+    row = {'timestamp': timestamp, 'pupils_located': True, 'left_pupil': [300, 220], 'right_pupil': [400, 221],
+           'horizontal_ratio': 0.5, 'vertical_ratio': 0.5, 'is_blinking': False}
+    row.update(fields)
+    return row
+
+
+def wait_for_stats(scheduler, timeout=5.0, **expected):
+    # Done callbacks run after .result() has returned, so counters update a little later
+    deadline = time.monotonic() + timeout
+    while True:
+        stats = scheduler.stats()
+        if all(stats[name] == value for name, value in expected.items()) or time.monotonic() > deadline:
+            return stats
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = StreamScheduler(workers=1, idle_timeout=60.0)
+    scheduler.start()
+    yield scheduler
+    scheduler.shutdown()
+
+
+def test_features_are_analyzed():
+    stream = StreamAnalysis()
+    results = stream.process_features([feature_row(10.0), feature_row(10.1, pupils_located=False)])
+
+    assert [result['pupils_located'] for result in results] == [True, False]
+    assert results[0]['left_pupil'] == [300, 220]
+    assert stream.analysis()['frames'] == 2
+
+
+@pytest.mark.parametrize('rows', [
+    {'timestamp': 1.0},
+    [feature_row(None)],
+    [{'pupils_located': True, 'left_pupil': [300, 220], 'right_pupil': [400, 221]}],
+    [feature_row(1.0, left_pupil=None)],
+    [feature_row(1.0, right_pupil=[400])],
+    ['not a row'],
+])
+def test_malformed_features_are_rejected(rows):
+    stream = StreamAnalysis()
+    with pytest.raises(ValueError):
+        stream.process_features(rows)
+    assert stream.frames == 0
+
+
+def test_idle_streams_are_evicted(scheduler):
+    idle = scheduler.open_stream()
+    active = scheduler.open_stream()
+    scheduler.submit_features(active, [feature_row(1.0)]).result()
+    scheduler.last_used[idle] -= 120
+
+    assert scheduler.evict_idle_streams() == [idle]
+    assert scheduler.stats()['streams'] == 1
+    with pytest.raises(KeyError):
+        scheduler.submit_features(idle, [feature_row(2.0)])
+
+
+def test_crashed_worker_is_restarted(scheduler):
+    lost = scheduler.open_stream()
+    with pytest.raises(BrokenProcessPool):
+        scheduler._submit(0, os._exit, 1).result()
+
+    stats = wait_for_stats(scheduler, workers_restarted=1, streams_lost=1)
+    assert stats['workers_restarted'] == 1
+    assert stats['streams_lost'] == 1
+    with pytest.raises(KeyError):
+        scheduler.submit_features(lost, [feature_row(1.0)])
+
+    stream_id = scheduler.open_stream()
+    assert scheduler.submit_features(stream_id, [feature_row(1.0)]).result()[0]['pupils_located']
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from calibration import CalibrationModule
+
+
+def calibration_table(points, curvature=0.0, seed=0):
+    # Rows of (pupil_x, pupil_y, screen_x, screen_y, h_ratio, v_ratio); the
+    # screen x bends with the pupil x when curvature is set
+    rng = np.random.default_rng(seed)
+    rows = []
+    for _ in range(points):
+        pupil_x, pupil_y = rng.uniform(280, 360), rng.uniform(200, 240)
+        h_ratio, v_ratio = rng.uniform(0.3, 0.7), rng.uniform(0.3, 0.7)
+        screen_x = (pupil_x - 280) * 24 + curvature * (pupil_x - 320) ** 2
+        screen_y = (pupil_y - 200) * 27
+        rows.append((pupil_x, pupil_y, screen_x, screen_y, h_ratio, v_ratio))
+    return rows
+
+
+@pytest.mark.parametrize('points, curvature, degree', [(30, 0.0, 1), (30, 0.5, 2), (9, 0.5, 1)])
+def test_regression_degree_is_chosen_by_leave_one_out_error(points, curvature, degree):
+    calibration = CalibrationModule(gaze_model='regression')
+    calibration.set_calibration_points(calibration_table(points, curvature))
+
+    assert calibration.regression_model['degree'] == degree
+    assert calibration.regression_model['loo_error'] is not None
+
+
+def test_five_points_use_untested_affine_model():
+    calibration = CalibrationModule(gaze_model='regression')
+    calibration.set_calibration_points(calibration_table(5))
+
+    assert calibration.regression_model['degree'] == 1
+    assert calibration.regression_model['loo_error'] is None
+
+
+def test_changing_calibration_points_rebuilds_arrays():
+    calibration = CalibrationModule()
+    calibration.set_calibration_points(calibration_table(5))
+    first = calibration.predict_batch(np.array([[320.0, 220.0]]), np.array([[0.5, 0.5]]))
+
+    # Same number of points, other values: the cached arrays must not be reused
+    calibration.set_calibration_points(calibration_table(5, seed=1))
+    pupils, _, _ = calibration._calibration_arrays()
+    np.testing.assert_array_equal(pupils, np.array(calibration_table(5, seed=1))[:, 0:2])
+    assert calibration.predict_batch(np.array([[320.0, 220.0]]), np.array([[0.5, 0.5]])).tolist() != first.tolist()
+
+    calibration.reset_calibration()
+    assert calibration._cal_size is None
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from gaze_store import ColumnarStore
+
+
+@pytest.mark.parametrize('chunk_size', [3, 8, 64])
+def test_max_samples_is_exact(chunk_size, tmp_path):
+    store = ColumnarStore(('value', 'timestamp'), chunk_size=chunk_size, max_samples=20,
+                          spill_path=tmp_path / 'spill.bin')
+    for i in range(100):
+        store.append(i, i / 30)
+        assert len(store) == min(i + 1, 20)
+        assert store.column('value')[0] == max(0, i - 19)
+
+    store.extend(np.arange(100, 137), np.arange(100, 137) / 30)
+    assert len(store) == 20
+    np.testing.assert_array_equal(store.column('value'), np.arange(117, 137))
+    np.testing.assert_array_equal(store.load_spilled()[:, 0], np.arange(117))
+    assert store.total_count == 137
+
+
+def test_unbounded_store_keeps_everything():
+    store = ColumnarStore(('value',), chunk_size=4)
+    store.extend(np.arange(10))
+    for i in range(10, 15):
+        store.append(i)
+
+    np.testing.assert_array_equal(store.column('value'), np.arange(15))
+    assert store.last() == (14.0,)
@@ -0,0 +1,14 @@
+import pytest
+
+from frame_sources import ImageSequenceSource
+from headless import HeadlessTracker
+
+
+def test_failed_run_leaves_no_empty_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # Calibration files are read from the working directory
+    output_dir = tmp_path / 'results'
+    tracker = HeadlessTracker(frame_source=ImageSequenceSource(tmp_path / 'missing'), output_dir=output_dir)
+
+    with pytest.raises(Exception):
+        tracker.run(max_frames=5)
+    assert list(output_dir.iterdir()) == []
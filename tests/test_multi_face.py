@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+dlib = pytest.importorskip('dlib')
+
+from gaze_tracking import GazeResult, MultiFaceTracking
+from gaze_tracking import models
+from gaze_tracking.gaze_tracking import GazeTracking
+
+USER = dlib.rectangle(10, 10, 200, 200)
+OTHER = dlib.rectangle(300, 10, 500, 200)
+
+
+@pytest.fixture
+def tracker(monkeypatch):
+    # Known face boxes instead of the dlib models; each face "looks" at its own box
+    boxes = []
+    monkeypatch.setattr(models, 'get_face_detector', lambda: lambda image, *args: list(boxes))
+    monkeypatch.setattr(models, 'get_shape_predictor', lambda model_path=None: None)
+    monkeypatch.setattr(GazeTracking, 'refresh_face',
+                        lambda self, frame, box, gray=None: GazeResult(True, (box.left(), 50), (box.right(), 50)))
+
+    tracker = MultiFaceTracking(max_missed_frames=5)
+    tracker.boxes = boxes
+    yield tracker
+    tracker.close()
+
+
+def test_other_faces_never_stand_in_for_the_calibrated_face(tracker):
+    frame = np.zeros((480, 640, 3), np.uint8)
+    tracker.boxes[:] = [USER, OTHER]
+    tracker.refresh(frame)
+    assert tracker.primary_face_id == 0
+    assert tracker.result.left_pupil == (USER.left(), 50)
+
+    # The user looks away for a few frames while someone else stays in view
+    tracker.boxes[:] = [OTHER]
+    for _ in range(3):
+        tracker.refresh(frame)
+        assert tracker.primary_face_id is None
+        assert not tracker.result.pupils_located
+        assert tracker._trackers[0].calibration is tracker.calibration
+
+    tracker.boxes[:] = [USER, OTHER]
+    tracker.refresh(frame)
+    assert tracker.primary_face_id == 0
+    assert tracker.result.left_pupil == (USER.left(), 50)
+
+
+def test_calibration_moves_when_the_calibrated_face_is_forgotten(tracker):
+    frame = np.zeros((480, 640, 3), np.uint8)
+    tracker.boxes[:] = [USER, OTHER]
+    tracker.refresh(frame)
+
+    tracker.boxes[:] = [OTHER]
+    for _ in range(tracker.max_missed_frames + 1):
+        tracker.refresh(frame)
+
+    assert tracker.primary_face_id == 1
+    assert tracker._trackers[1].calibration is tracker.calibration
+    assert tracker.result.left_pupil == (OTHER.left(), 50)
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from data_processing import DataProcessing
+
+
+def synthetic_session(seed, frames=900):
+    # 30 fps session with blinks, gaze dropouts and a mix of center, edge and saccade positions
+    rng = np.random.default_rng(seed)
+    timestamps = 1000.0 + np.arange(frames) / 30.0
+    blink_flags = rng.random(frames) < 0.08
+    gaze_xy = np.column_stack([rng.integers(0, 1920, frames), rng.integers(0, 1080, frames)]).astype(float)
+    drift = rng.random(frames) < 0.6
+    gaze_xy[drift] = [960, 540] + rng.integers(-120, 120, (int(drift.sum()), 2))
+    gaze_xy[rng.random(frames) < 0.1] = np.nan
+    return timestamps, blink_flags, gaze_xy
+
+
+def streamed_analysis(timestamps, blink_flags, gaze_xy, processing=None):
+    processing = processing or DataProcessing()
+    processing.reset_session(start_time=timestamps[0])
+    for timestamp, blinking, (x, y) in zip(timestamps, blink_flags, gaze_xy):
+        gaze_position = None if np.isnan(x) else (int(x), int(y))
+        processing.process_frame({'timestamp': timestamp, 'is_blinking': bool(blinking)}, gaze_position)
+    processing.end_session(timestamps[-1])
+    return processing.get_comprehensive_analysis()
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_process_session_matches_process_frame(seed):
+    timestamps, blink_flags, gaze_xy = synthetic_session(seed)
+
+    expected = streamed_analysis(timestamps, blink_flags, gaze_xy)
+    actual = DataProcessing().process_session(timestamps, blink_flags, gaze_xy)
+
+    assert actual.keys() == expected.keys()
+    for key, value in expected.items():
+        if isinstance(value, float):
+            assert actual[key] == pytest.approx(value, rel=1e-9, abs=1e-9), key
+        else:
+            assert actual[key] == value, key
+
+
+def test_process_session_without_gaze():
+    timestamps, blink_flags, gaze_xy = synthetic_session(0, frames=120)
+    gaze_xy[:] = np.nan
+
+    expected = streamed_analysis(timestamps, blink_flags, gaze_xy)
+    actual = DataProcessing().process_session(timestamps, blink_flags, gaze_xy)
+
+    assert actual == pytest.approx(expected)
+
+
+def test_sample_cap_keeps_the_analysis():
+    timestamps, blink_flags, gaze_xy = synthetic_session(3)
+    capped = DataProcessing(max_stored_samples=50)
+
+    expected = streamed_analysis(timestamps, blink_flags, gaze_xy)
+    actual = streamed_analysis(timestamps, blink_flags, gaze_xy, capped)
+
+    assert len(capped.gaze_positions) == 50
+    assert actual == pytest.approx(expected)
@@ -0,0 +1,42 @@
+import numpy as np
+
+from gaze_tracking.calibration import Calibration
+
+
+def open_eye():
+    # Iris covers about half of the eye frame at threshold 50
+    eye = np.full((30, 50), 200, np.uint8)
+    eye[:, :25] = 10
+    return eye
+
+
+def closed_eye():
+    return np.full((30, 50), 200, np.uint8)
+
+
+def loaded_calibration():
+    calibration = Calibration()
+    calibration.load_thresholds(50, 50)
+    return calibration
+
+
+def test_one_blink_keeps_loaded_thresholds():
+    calibration = loaded_calibration()
+    frames = [closed_eye()] + [open_eye()] * (calibration.validation_frames - 1)
+    for frame in frames:
+        calibration.validate(frame, 0)
+
+    assert calibration.is_complete()
+    assert not calibration.needs_validation(0)
+    assert calibration.needs_validation(1)
+
+
+def test_wrong_thresholds_are_discarded():
+    calibration = loaded_calibration()
+    for _ in range(calibration.validation_frames - 1):
+        calibration.validate(closed_eye(), 1)
+        assert calibration.is_complete()
+
+    calibration.validate(closed_eye(), 1)
+    assert not calibration.is_complete()
+    assert not calibration.needs_validation(0)
@@ -0,0 +1,94 @@
+import json
+import time
+import threading
+import numpy as np
+from collections import deque
+
+
+class StageTimer:
+    def __init__(self, enabled=True, window=300):
+        # Disabled timers cost one attribute check per call
+        self.enabled = enabled
+        self.window = window
+        self.samples = {}  # stage -> deque of durations in ns
+        self.totals = {}  # stage -> (count, total ns) since reset
+        self.ticks = deque(maxlen=window)
+        self._lock = threading.Lock()  # Stages may be recorded from several threads
+
+    def start(self):
+        if not self.enabled:
+            return 0
+        return time.perf_counter_ns()
+
+    def record(self, stage, start):
+        if not self.enabled:
+            return
+        duration = time.perf_counter_ns() - start
+
+        with self._lock:
+            samples = self.samples.get(stage)
+            if samples is None:
+                samples = self.samples[stage] = deque(maxlen=self.window)
+            samples.append(duration)
+
+            count, total = self.totals.get(stage, (0, 0))
+            self.totals[stage] = (count + 1, total + duration)
+
+    def lap(self, stage, start):
+        # Records the stage and returns the start of the next one
+        if not self.enabled:
+            return 0
+        self.record(stage, start)
+        return time.perf_counter_ns()
+
+    def tick(self):
+        # Marks one completed loop iteration, for FPS
+        if self.enabled:
+            self.ticks.append(time.perf_counter_ns())
+
+    def fps(self):
+        if len(self.ticks) < 2:
+            return 0.0
+        elapsed = (self.ticks[-1] - self.ticks[0]) / 1e9
+        return (len(self.ticks) - 1) / elapsed if elapsed > 0 else 0.0
+
+    def histogram(self, stage, bins=20):
+        # Rolling histogram of the recent durations of a stage, in ms
+        with self._lock:
+            samples = list(self.samples.get(stage, ()))
+        if not samples:
+            return [], []
+        counts, edges = np.histogram(np.array(samples, dtype=np.int64) / 1e6, bins=bins)
+        return counts.tolist(), edges.tolist()
+
+    def snapshot(self):
+        with self._lock:
+            recent = {stage: list(samples) for stage, samples in self.samples.items()}
+            totals = dict(self.totals)
+
+        stages = {}
+        for stage, samples in recent.items():
+            durations = np.array(samples, dtype=np.int64) / 1e6
+            count, total = totals[stage]
+            stages[stage] = {
+                'count': count,
+                'mean_ms': total / count / 1e6,
+                'recent_p50_ms': float(np.percentile(durations, 50)),
+                'recent_p99_ms': float(np.percentile(durations, 99)),
+            }
+        return {'fps': self.fps(), 'stages': stages}
+
+    def dump(self, path, bins=20):
+        report = self.snapshot()
+        for stage, stats in report['stages'].items():
+            counts, edges = self.histogram(stage, bins)
+            stats['histogram'] = {'counts': counts, 'edges_ms': edges}
+
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    def reset(self):
+        with self._lock:
+            self.samples = {}
+            self.totals = {}
+            self.ticks.clear()
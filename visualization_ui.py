@@ -1,9 +1,6 @@
 import tkinter as tk
 from tkinter import messagebox, ttk
-import cv2
 import time
-import numpy as np
-import matplotlib.pyplot as plt
 
 
 class VisualizationUI:
@@ -12,42 +9,89 @@ class VisualizationUI:
         self.screen_height = screen_height
         self.root = None
         self.canvas = None
+        self.display_buffer = None  # Reused by create_monitoring_display
         
     def show_calibration_interface(self, calibration_module, data_acquisition):
+        from calibration import CalibrationSampler
+        
         self.root = tk.Tk()
         self.root.title("Eye Calibration")
         self.root.attributes('-fullscreen', True)
         self.root.configure(bg='black')
+        self.root.bind('<Escape>', lambda event: self._end_calibration(aborted=True))
         
         self.canvas = tk.Canvas(self.root, width=self.screen_width, height=self.screen_height, bg='black')
         self.canvas.pack()
         
-        points = calibration_module.get_calibration_points()
-        successful_points = 0
-        
-        for i, (x, y) in enumerate(points):
-            print(f"Calibrating point {i+1}/5 at ({x}, {y})")
-            
-            self._display_calibration_point(x, y, i+1)
-            
-            # Wait for user to focus
-            time.sleep(3)
-            
-            samples = calibration_module.collect_samples_for_point(data_acquisition, x, y)
-            
-            # Process samples
-            if calibration_module.process_calibration_point(samples, x, y):
-                successful_points += 1
-                print(f"  Point {i+1} calibrated! Got {len(samples)} samples")
-                self._show_success_feedback(x, y)
-            else:
-                print(f"  Point {i+1} failed calibration")
-                self._show_failure_feedback(x, y)
-            
-            time.sleep(0.5)  # Brief pause between points
+        # Frames are analyzed on a background thread while the dots are shown,
+        # the Tk loop only schedules the steps and stays responsive
+        self.calibration_module = calibration_module
+        self.calibration_points = calibration_module.get_calibration_points()
+        self.calibration_sampler = CalibrationSampler(calibration_module, data_acquisition)
+        self.successful_points = 0
+        self.calibration_aborted = False
+        
+        self.calibration_sampler.start()
+        self.root.after(0, self._start_calibration_point, 0)
+        try:
+            self.root.mainloop()
+        finally:
+            self.calibration_sampler.stop()
+            self.root.destroy()
+            self.root = None
+        
+        if self.calibration_sampler.error:
+            raise self.calibration_sampler.error
+        if self.calibration_aborted:
+            return False
+        return calibration_module.complete_calibration(self.successful_points)
+    
+    def _start_calibration_point(self, index):
+        if index >= len(self.calibration_points):
+            self._end_calibration()
+            return
+        
+        x, y = self.calibration_points[index]
+        print(f"Calibrating point {index+1}/{len(self.calibration_points)} at ({x}, {y})")
+        self._display_calibration_point(x, y, index+1)
+        
+        # Give the user time to focus before sampling
+        settle_ms = int(self.calibration_module.settle_time_per_point * 1000)
+        self.root.after(settle_ms, self._begin_point_sampling, index)
+    
+    def _begin_point_sampling(self, index):
+        self.calibration_sampler.begin_point(index)
+        self.root.after(50, self._check_point_sampling, index, time.time())
+    
+    def _check_point_sampling(self, index, started):
+        module = self.calibration_module
+        if not self.calibration_sampler.is_running:
+            # Source ended or the capture failed
+            self._end_calibration(aborted=self.calibration_sampler.error is not None)
+            return
+        
+        if (self.calibration_sampler.sample_count() < module.max_samples_per_point and
+                time.time() - started < module.sampling_window_per_point):
+            self.root.after(50, self._check_point_sampling, index, started)
+            return
+        
+        samples = self.calibration_sampler.end_point()
+        x, y = self.calibration_points[index]
+        
+        # Process samples
+        if module.process_calibration_point(samples, x, y):
+            self.successful_points += 1
+            print(f"  Point {index+1} calibrated! Got {len(samples)} samples")
+            self._show_success_feedback(x, y)
+        else:
+            print(f"  Point {index+1} failed calibration")
+            self._show_failure_feedback(x, y)
         
-        self.root.destroy()
-        return calibration_module.complete_calibration(successful_points)
+        self.root.after(500, self._start_calibration_point, index + 1)  # Brief pause between points
+    
+    def _end_calibration(self, aborted=False):
+        self.calibration_aborted = self.calibration_aborted or aborted
+        self.root.quit()
     
     def _display_calibration_point(self, x, y, point_num):
         self.canvas.delete("all")
@@ -88,8 +132,21 @@ class VisualizationUI:
         root.destroy()
         return response
     
-    def create_monitoring_display(self, frame, gaze_position, analysis_data):
-        display_frame = frame.copy()
+    def create_monitoring_display(self, frame, gaze_position, analysis_data, timings=None, gaze_result=None):
+        import cv2
+        import numpy as np
+        
+        # Overlays go into one buffer reused across frames, so the camera
+        # frame stays untouched and nothing is allocated per frame. The
+        # returned image is only valid until the next call
+        if self.display_buffer is None or self.display_buffer.shape != frame.shape:
+            self.display_buffer = np.empty_like(frame)
+        display_frame = self.display_buffer
+        np.copyto(display_frame, frame)
+        
+        if gaze_result is not None:
+            from gaze_tracking import GazeTracking
+            GazeTracking.draw_pupils(display_frame, gaze_result)
         
         # Status info - make it more casual
         status_color = (0, 255, 0) if analysis_data.get('pupils_located', False) else (0, 0, 255)
@@ -117,8 +174,24 @@ class VisualizationUI:
             cv2.putText(display_frame, f"Assessment: {analysis_data['assessment']}", 
                        (10, 150), cv2.FONT_HERSHEY_SIMPLEX, 0.6, assessment_color, 1)
         
+        if timings:
+            self._draw_timings(display_frame, timings)
+        
         return display_frame
     
+    def _draw_timings(self, display_frame, timings):
+        import cv2
+        
+        # FPS and recent median time per stage, bottom left
+        lines = [f"FPS: {timings['fps']:.1f}"]
+        for stage, stats in timings['stages'].items():
+            lines.append(f"{stage}: {stats['recent_p50_ms']:.1f} ms")
+        
+        y = display_frame.shape[0] - 10 - 18 * (len(lines) - 1)
+        for line in lines:
+            cv2.putText(display_frame, line, (10, y), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 255, 255), 1)
+            y += 18
+    
     def show_results_dialog(self, analysis_data):
         root = tk.Tk()
         root.title("How did I do?")
@@ -232,6 +305,9 @@ class VisualizationUI:
         root.destroy()
     
     def create_visualization_plots(self, analysis_data):
+        # Only needed once at the end of a session, so imported here
+        import matplotlib.pyplot as plt
+        
         fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(12, 8))
         fig.suptitle('Social Anxiety Tracking Results', fontsize=16)
         